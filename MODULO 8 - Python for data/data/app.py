@@ -1,15 +1,219 @@
-from dash import Dash, Input, Output
-from views.layout import serve_layout
-from models.data_model import load_data
+import gzip
+import hmac
+import importlib.util
+import json
+import os
+import re
+import threading
+
+from dash import Dash, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import abort, jsonify, request, send_from_directory
+from views.layout import (
+    IMAGE_ROUTE,
+    cached_payload,
+    filters_from_controls,
+    get_layout_cache_stats,
+    render_tab,
+    serve_layout,
+    warm_up_tabs,
+)
+from models.data_model import (
+    FILTER_COLUMNS,
+    IMAGE_CACHE_DIR,
+    build_age_index,
+    build_geo_coords,
+    filters_key,
+    get_dataset,
+    get_filtered_derived,
+    get_memory_stats,
+    get_reload_status,
+    load_data,
+    start_reload,
+    start_source_watcher,
+)
 from controllers import eda_controller as ec
 
+# Compresión de las respuestas (EDA_COMPRESS=0 para desactivarla): gzip/brotli
+# con flask-compress (pip install "dash[compress]") si está instalado; si no,
+# gzip propio en after_request (ver más abajo)
+COMPRESS = os.environ.get("EDA_COMPRESS", "1") == "1"
+HAS_FLASK_COMPRESS = importlib.util.find_spec("flask_compress") is not None
+
 # Inicializar app
-app = Dash(__name__, suppress_callback_exceptions=True)
+app = Dash(__name__, suppress_callback_exceptions=True,
+           compress=COMPRESS and HAS_FLASK_COMPRESS)
 app.title = "EDA – Campaña Depósitos"
 app.layout = serve_layout
+server = app.server   # WSGI para servidores multiproceso (gunicorn -w N app:server)
+
+# Cargar datos una sola vez antes de arrancar el servidor.
+# El origen se configura con EDA_DATA_SOURCE (auto/snapshot/files/postgres).
+load_data()
+
+# Opcional: calcular ya todas las pestañas (en paralelo) para que el primer
+# clic en cada una sea inmediato
+if os.environ.get("EDA_WARM_TABS", "0") == "1":
+    warm_up_tabs()
+
+# Opcional: vigilar los ficheros de origen cada N segundos y recargar el
+# dataset en caliente si cambian (0 = desactivado)
+WATCH_INTERVAL = float(os.environ.get("EDA_WATCH_INTERVAL", "0"))
+if WATCH_INTERVAL > 0:
+    start_source_watcher(WATCH_INTERVAL)
+
+# ======================================================
+# COMPRESIÓN gzip (si no está flask-compress)
+# ======================================================
+_GZIP_MIMETYPES = {
+    "application/json", "text/html", "text/css",
+    "application/javascript", "text/javascript",
+}
+_GZIP_MIN_BYTES = 500
+# Ficheros estáticos ya comprimidos: {(ruta, etag): gzip}. Son los que traen
+# ETag y los JS de Dash/Plotly (URL con la versión, no cambian nunca)
+_GZIP_STATIC_CACHE = {}
+_GZIP_LOCK = threading.Lock()
+
+
+def comprimir_respuesta(response):
+    """
+    Comprime con gzip las respuestas de texto (JSON de los callbacks, HTML,
+    JS, CSS) si el navegador lo acepta. Los ficheros estáticos se comprimen
+    una sola vez; los PNG ya van comprimidos y no se tocan.
+    """
+    if (
+        response.status_code != 200
+        or response.mimetype not in _GZIP_MIMETYPES
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+    ):
+        return response
+
+    etag, weak = response.get_etag()
+    static = etag or request.path.startswith("/_dash-component-suites/")
+    static_key = (request.full_path, etag) if static else None
+    with _GZIP_LOCK:
+        body = _GZIP_STATIC_CACHE.get(static_key) if static_key else None
+    if body is None:
+        response.direct_passthrough = False   # ficheros servidos con send_file
+        data = response.get_data()
+        if len(data) < _GZIP_MIN_BYTES:
+            return response
+        body = gzip.compress(data, compresslevel=6)
+        if static_key:
+            with _GZIP_LOCK:
+                _GZIP_STATIC_CACHE[static_key] = body
+
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    if etag:
+        response.set_etag(f"{etag}-gzip", weak=weak)
+    return response
+
+
+def etag_sin_gzip():
+    """El navegador revalida con el ETag "-gzip": se compara con el original (304)."""
+    if_none_match = request.environ.get("HTTP_IF_NONE_MATCH", "")
+    if "-gzip" in if_none_match:
+        request.environ["HTTP_IF_NONE_MATCH"] = if_none_match.replace("-gzip", "")
+
+
+if COMPRESS and not HAS_FLASK_COMPRESS:
+    app.server.before_request(etag_sin_gzip)
+    app.server.after_request(comprimir_respuesta)
+
+
+# ======================================================
+# ENDPOINT: estado de la cache del layout (aciertos/fallos)
+# ======================================================
+@app.server.route("/api/cache-stats")
+def cache_stats():
+    return jsonify(layout=get_layout_cache_stats(), memory=get_memory_stats())
+
+
+# ======================================================
+# ENDPOINT: recarga del dataset en caliente (sin reiniciar)
+# ======================================================
+ADMIN_TOKEN = os.environ.get("EDA_ADMIN_TOKEN", "")
+
+
+@app.server.route("/admin/reload", methods=["GET", "POST"])
+def recargar_datos():
+    """
+    POST: lanza la recarga del dataset en un hilo aparte (202) y devuelve
+    enseguida; las peticiones en curso terminan con la versión anterior.
+    GET: estado de la última recarga y versión en memoria.
+    Con EDA_ADMIN_TOKEN se exige la cabecera X-Admin-Token; sin él solo se
+    admiten peticiones desde la propia máquina.
+    """
+    if ADMIN_TOKEN:
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+            abort(403)
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(403)
+
+    if request.method == "POST":
+        accepted = start_reload()
+        return jsonify(accepted=accepted, **get_reload_status()), 202 if accepted else 409
+    return jsonify(get_reload_status())
+
+
+# ======================================================
+# ENDPOINT: imágenes Matplotlib cacheadas (nombre = hash del contenido)
+# ======================================================
+_IMAGE_NAME = re.compile(r"^[0-9a-f]{20}\.png$")
+
+
+@app.server.route(IMAGE_ROUTE + "<name>")
+def imagen_cacheada(name):
+    """
+    Sirve un PNG de la cache de imágenes. Como el nombre es el hash del
+    contenido, el fichero nunca cambia: ETag = hash y caché de un año.
+    """
+    if not _IMAGE_NAME.match(name):
+        abort(404)
+    response = send_from_directory(
+        IMAGE_CACHE_DIR, name, mimetype="image/png",
+        etag=name.removesuffix(".png"), max_age=31_536_000,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+# ======================================================
+# CALLBACK: barra de filtros global → Store "filtros-globales"
+# ======================================================
+@app.callback(
+    Output("filtros-globales", "data"),
+    [Input(f"filtro-{col}", "value") for col in FILTER_COLUMNS]
+    + [Input("filtro-edad", "value"), Input("filtro-fecha", "value")],
+    prevent_initial_call=True,
+)
+def actualizar_filtros(*values):
+    """Guarda la selección de la barra de filtros (solo los filtros activos)."""
+    *categorias, rango_edad, rango_fecha = values
+    return filters_from_controls(dict(zip(FILTER_COLUMNS, categorias)), rango_edad, rango_fecha)
+
+
+# ======================================================
+# CALLBACK: contenido de la pestaña activa (render perezoso)
+# ======================================================
+@app.callback(
+    Output("tab-content", "children"),
+    [Input("tabs-eda", "value"), Input("filtros-globales", "data")],
+    prevent_initial_call=True,   # la pestaña inicial ya viene en el layout
+)
+def mostrar_pestana(tab, filtros):
+    """
+    Solo se calculan (y se envían) las figuras de la pestaña seleccionada,
+    sobre los clientes que cumplen los filtros globales.
+    """
+    return render_tab(tab, filtros)
 
-# Cargar datos una sola vez antes de arrancar el servidor
-df_global = load_data()
 
 # ======================================================
 # CALLBACK: filtro de edad → gráfico + texto conversión
@@ -18,30 +222,66 @@ df_global = load_data()
     [Output("graph-conv-age", "figure"),
      Output("text-conv-age", "children")],
     [Input("filtro-edad-conv", "value")],
+    [State("filtros-globales", "data")],
 )
-def actualizar_conversion_edad(rango_edad):
+def actualizar_conversion_edad(rango_edad, filtros):
     """
-    Filtra el dataframe global por rango de edad y recalcula:
+    Recalcula para el rango de edad seleccionado:
     - Gráfico de conversión por rangos de edad
     - Texto explicativo
+    Usa el índice ordenado por edad (sumas acumuladas de y_bin): no se
+    filtra ni se copia el DataFrame en cada movimiento del slider.
+    Con filtros globales el índice es el de ese subconjunto, construido una
+    vez por (versión, filtros); cada rango solo calcula la figura.
+    La respuesta se guarda serializada por (versión, filtros, rango).
     """
-    # Seguridad básica
-    if not rango_edad or len(rango_edad) != 2:
-        df_filtrado = df_global
-    else:
-        edad_min, edad_max = rango_edad
-        df_filtrado = df_global[
-            (df_global["age"] >= edad_min) & (df_global["age"] <= edad_max)
-        ]
+    dataset = get_dataset()
 
-    fig, texto = ec.get_conversion_by_age_figure(df_filtrado)
+    def build():
+        age_index = get_filtered_derived("age_index", build_age_index, filtros, dataset)
+        # Seguridad básica: sin rango válido → todo el dataset
+        return ec.get_conversion_by_age_range_figure(age_index, rango_edad)
+
+    key = (dataset["version"], "conv-age", filters_key(filtros), json.dumps(rango_edad))
+    fig, texto = cached_payload(key, build)
     return fig, texto
 
-if __name__ == "__main__":
-    # 2) Antes de arrancar el servidor, garantizamos que el merged esté listo
-    print("[INFO] Inicializando datos...")
-    _ = load_data()   # aquí se genera o carga merged_dataset.csv
 
-    # 3) Ahora sí, arrancamos el servidor Dash
+# ======================================================
+# CALLBACK: zoom en el mapa → re-agregar la rejilla de densidad
+# ======================================================
+@app.callback(
+    Output("graph-geo", "figure"),
+    [Input("graph-geo", "relayoutData")],
+    [State("filtros-globales", "data")],
+    prevent_initial_call=True,
+)
+def reagregar_mapa(relayout, filtros):
+    """
+    Recalcula la rejilla de densidad para la zona visible, de modo que el
+    tamaño de la figura depende de la resolución y no del nº de clientes.
+    En modo "scatter" los puntos ya están en el navegador: no se hace nada.
+    """
+    ranges = ec.geo_ranges_from_relayout(relayout)
+    if ec.GEO_MODE == "scatter" or ranges is False:
+        raise PreventUpdate
+
+    x_range, y_range = ranges
+    dataset = get_dataset()
+
+    def build():
+        # Coordenadas del subconjunto filtrado, una vez por (versión, filtros)
+        geo_coords = get_filtered_derived("geo_coords", build_geo_coords, filtros, dataset)
+        return ec.get_geo_density_figure(dataset["df"], geo_coords, x_range, y_range)[0]
+
+    key = (dataset["version"], "geo", filters_key(filtros), json.dumps(ranges))
+    fig = cached_payload(key, build)
+    if fig is None:
+        raise PreventUpdate
+    return fig
+
+
+if __name__ == "__main__":
+    # Los datos ya se han cargado (o generado) al importar el módulo
     print("[INFO] Datos listos. Iniciando servidor Dash...")
     app.run(debug=True)
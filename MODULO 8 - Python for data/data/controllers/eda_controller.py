@@ -1,15 +1,30 @@
-import base64
 import io
+import os
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
-import matplotlib
-matplotlib.use("Agg")   # backend sin interfaz gráfica
-
-import matplotlib.pyplot as plt
+# Matplotlib sin pyplot: cada imagen usa su propia Figure + lienzo Agg, sin
+# estado global, para poder renderizar desde varios hilos a la vez
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import seaborn as sns
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+
+from models.data_model import (
+    AGE_BINS,
+    age_index_bin_stats,
+    conversion_bins,
+    cube_counts,
+    fit_logistic_age_model,
+    get_histogram_density,
+    logistic_age_percentiles,
+    logistic_age_proba,
+    segment,
+    segment_count,
+    segment_counts,
+    segment_intersect,
+)
 
 
 def _fix_plotly(fig, height: int = 260):
@@ -31,106 +46,230 @@ def _fix_plotly(fig, height: int = 260):
 
 
 
-def _matplotlib_to_base64():
+# Tema de Seaborn: se fija una sola vez al importar (no en cada petición)
+sns.set(style="whitegrid")
+
+
+def _new_figure():
+    """Figura independiente (6x4) con su lienzo Agg y un único eje."""
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def _figure_to_png(fig: Figure) -> bytes:
     buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png", dpi=110)
-    plt.close()
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode("utf-8")
+    fig.tight_layout()
+    fig.savefig(buf, format="png", dpi=110)
+    return buf.getvalue()
 
 
 # ======================
 # Numéricas (Matplotlib / Seaborn)
 # ======================
+# Las funciones get_*_image devuelven (PNG en bytes | None, texto); la vista
+# las guarda en la cache de imágenes y las sirve por URL. Con
+# EDA_NUMERIC_CHARTS=plotly se usan en su lugar las get_*_histogram_figure
+# (histogramas calculados con np.histogram y dibujados con Plotly). Edad e
+# ingresos llevan además la curva KDE de get_histogram_density, calculada una
+# vez por versión del dataset y común a los dos motores.
+NUMERIC_CHARTS = os.environ.get("EDA_NUMERIC_CHARTS", "image").strip().lower()
 
-def get_age_distribution_image(df: pd.DataFrame):
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(6, 4))
-    sns.histplot(df["age"], kde=True, bins=20, color="#2563eb")
-    plt.title("Distribución de la edad de los clientes")
-    plt.xlabel("Edad (años)")
-    plt.ylabel("Número de clientes")
-
-    img_b64 = _matplotlib_to_base64()
 
+def _age_distribution_text(df: pd.DataFrame) -> str:
     media = df["age"].mean()
-    texto = (
+    return (
         f"La mayoría de clientes se concentra entre los 30 y los 50 años, "
         f"con una edad media cercana a los {media:.1f} años."
     )
-    return img_b64, texto
-
-
-def get_income_distribution_image(df: pd.DataFrame):
-    if "Income" not in df.columns:
-        return None, "No se dispone de la variable de ingresos en el dataset."
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(6, 4))
-    sns.histplot(df["Income"], kde=True, bins=25, color="#059669")
-    plt.title("Distribución del nivel de ingresos")
-    plt.xlabel("Ingreso anual estimado")
-    plt.ylabel("Número de clientes")
 
-    img_b64 = _matplotlib_to_base64()
 
+def _income_distribution_text(df: pd.DataFrame) -> str:
     media = df["Income"].mean()
-    texto = (
+    return (
         "Los ingresos presentan una distribución asimétrica: la mayoría de clientes se mueve en "
         f"rangos medios, pero existen algunos con ingresos elevados. El ingreso medio ronda los {media:,.0f}."
     )
-    return img_b64, texto
 
 
-def get_numwebvisits_distribution_image(df: pd.DataFrame):
-    if "NumWebVisitsMonth" not in df.columns:
-        return None, "No se dispone de visitas web mensuales en el dataset."
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(6, 4))
-    sns.countplot(x="NumWebVisitsMonth", data=df, color="#7c3aed")
-    plt.title("Número de visitas web mensuales")
-    plt.xlabel("Visitas web en el último mes")
-    plt.ylabel("Número de clientes")
-
-    img_b64 = _matplotlib_to_base64()
-
+def _numwebvisits_distribution_text(df: pd.DataFrame) -> str:
     media = df["NumWebVisitsMonth"].mean()
-    texto = (
+    return (
         f"La mayoría de clientes realiza pocas visitas web al mes, con una media aproximada de {media:.1f} visitas. "
         "Esto sugiere un uso moderado de los canales digitales."
     )
-    return img_b64, texto
+
+
+_KIDTEEN_TEXT = (
+    "La mayoría de los clientes convive con un número reducido de niños y adolescentes, "
+    "lo que indica hogares de tamaño pequeño o medio y una estructura familiar bastante homogénea."
+)
+
+
+def _draw_histogram_density(ax, hist: dict, color: str):
+    """Barras + curva KDE ya calculadas (mismo aspecto que histplot(kde=True))."""
+    edges = hist["edges"]
+    ax.bar(edges[:-1], hist["counts"], width=np.diff(edges), align="edge",
+           color=color, alpha=0.5, edgecolor="white", linewidth=0.5)
+    if hist["curve"] is not None:
+        ax.plot(hist["x"], hist["curve"], color=color, linewidth=1.5)
+
+
+def get_age_distribution_image(df: pd.DataFrame):
+    fig, ax = _new_figure()
+    _draw_histogram_density(ax, get_histogram_density(df, "age", 20), "#2563eb")
+    ax.set_title("Distribución de la edad de los clientes")
+    ax.set_xlabel("Edad (años)")
+    ax.set_ylabel("Número de clientes")
+
+    return _figure_to_png(fig), _age_distribution_text(df)
+
+
+def get_income_distribution_image(df: pd.DataFrame):
+    if "Income" not in df.columns:
+        return None, "No se dispone de la variable de ingresos en el dataset."
+    fig, ax = _new_figure()
+    _draw_histogram_density(ax, get_histogram_density(df, "Income", 25), "#059669")
+    ax.set_title("Distribución del nivel de ingresos")
+    ax.set_xlabel("Ingreso anual estimado")
+    ax.set_ylabel("Número de clientes")
+
+    return _figure_to_png(fig), _income_distribution_text(df)
+
+
+def get_numwebvisits_distribution_image(df: pd.DataFrame):
+    if "NumWebVisitsMonth" not in df.columns:
+        return None, "No se dispone de visitas web mensuales en el dataset."
+    fig, ax = _new_figure()
+    sns.countplot(x="NumWebVisitsMonth", data=df, color="#7c3aed", ax=ax)
+    ax.set_title("Número de visitas web mensuales")
+    ax.set_xlabel("Visitas web en el último mes")
+    ax.set_ylabel("Número de clientes")
+
+    return _figure_to_png(fig), _numwebvisits_distribution_text(df)
 
 
 def get_kidteen_distribution_image(df: pd.DataFrame):
     cols = [c for c in ["Kidhome", "Teenhome"] if c in df.columns]
     if not cols:
         return None, "No se dispone de información sobre menores en el hogar."
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(6, 4))
+    fig, ax = _new_figure()
     melted = df[cols].melt(var_name="Tipo", value_name="Número")
     melted["Tipo"] = melted["Tipo"].map({"Kidhome": "Niños", "Teenhome": "Adolescentes"})
-    sns.countplot(data=melted, x="Número", hue="Tipo")
-    plt.title("Distribución de menores en el hogar")
-    plt.xlabel("Número de menores en el hogar")
-    plt.ylabel("Número de clientes")
+    sns.countplot(data=melted, x="Número", hue="Tipo", ax=ax)
+    ax.set_title("Distribución de menores en el hogar")
+    ax.set_xlabel("Número de menores en el hogar")
+    ax.set_ylabel("Número de clientes")
 
-    img_b64 = _matplotlib_to_base64()
+    return _figure_to_png(fig), _KIDTEEN_TEXT
 
-    texto = (
-        "La mayoría de los clientes convive con un número reducido de niños y adolescentes, "
-        "lo que indica hogares de tamaño pequeño o medio y una estructura familiar bastante homogénea."
+
+def _histogram_figure(hist: dict, title: str, xlabel: str, color: str):
+    """
+    Histograma Plotly a partir de get_histogram_density: solo viajan los
+    conteos por tramo y los puntos de la curva KDE.
+    """
+    edges = hist["edges"]
+    fig = go.Figure(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=hist["counts"],
+            width=np.diff(edges),
+            marker_color=color,
+            opacity=0.6,
+            name="Clientes",
+        )
     )
-    return img_b64, texto
+    if hist["curve"] is not None:
+        fig.add_trace(go.Scatter(x=hist["x"], y=hist["curve"], mode="lines",
+                                 line=dict(color=color, width=2), name="Densidad (KDE)"))
+    fig.update_layout(title=title, bargap=0, showlegend=False)
+    fig.update_xaxes(title=xlabel)
+    fig.update_yaxes(title="Número de clientes")
+    return _fix_plotly(fig, height=320)
+
+
+def _discrete_counts(values: pd.Series) -> pd.Series:
+    """Nº de clientes por cada valor entero observado (equivale a un countplot)."""
+    return values.dropna().astype("int64").value_counts().sort_index()
+
+
+def get_age_histogram_figure(df: pd.DataFrame):
+    hist = get_histogram_density(df, "age", 20)
+    fig = _histogram_figure(hist, "Distribución de la edad de los clientes", "Edad (años)", "#2563eb")
+    return fig, _age_distribution_text(df)
+
+
+def get_income_histogram_figure(df: pd.DataFrame):
+    if "Income" not in df.columns:
+        return None, "No se dispone de la variable de ingresos en el dataset."
+    hist = get_histogram_density(df, "Income", 25)
+    fig = _histogram_figure(hist, "Distribución del nivel de ingresos", "Ingreso anual estimado", "#059669")
+    return fig, _income_distribution_text(df)
+
+
+def get_numwebvisits_histogram_figure(df: pd.DataFrame):
+    if "NumWebVisitsMonth" not in df.columns:
+        return None, "No se dispone de visitas web mensuales en el dataset."
+    counts = _discrete_counts(df["NumWebVisitsMonth"])
+    fig = go.Figure(go.Bar(x=counts.index, y=counts.to_numpy(), marker_color="#7c3aed"))
+    fig.update_layout(title="Número de visitas web mensuales")
+    fig.update_xaxes(title="Visitas web en el último mes", type="category")
+    fig.update_yaxes(title="Número de clientes")
+    return _fix_plotly(fig, height=320), _numwebvisits_distribution_text(df)
+
+
+def get_kidteen_histogram_figure(df: pd.DataFrame):
+    cols = [c for c in ["Kidhome", "Teenhome"] if c in df.columns]
+    if not cols:
+        return None, "No se dispone de información sobre menores en el hogar."
+    nombres = {"Kidhome": "Niños", "Teenhome": "Adolescentes"}
+    fig = go.Figure([
+        go.Bar(x=counts.index, y=counts.to_numpy(), name=nombres[col])
+        for col, counts in ((c, _discrete_counts(df[c])) for c in cols)
+    ])
+    fig.update_layout(title="Distribución de menores en el hogar", barmode="group")
+    fig.update_xaxes(title="Número de menores en el hogar", type="category")
+    fig.update_yaxes(title="Número de clientes")
+    return _fix_plotly(fig, height=320), _KIDTEEN_TEXT
 
 
 # ======================
 # Categóricas / financieras (Plotly)
 # ======================
 
-def get_marital_distribution_figure(df: pd.DataFrame):
-    counts = df["marital"].value_counts(normalize=True).reset_index()
-    counts.columns = ["marital", "proporcion"]
+def _category_counts(df: pd.DataFrame, col: str, normalize: bool = False,
+                     cube: dict | None = None, segments: dict | None = None) -> pd.DataFrame:
+    """
+    value_counts de una columna categórica (o de texto) con etiquetas str,
+    sin las categorías vacías que pandas incluye para el dtype category.
+    Si se pasa la vista de segmentos (segment_view) se cuenta con sus
+    bitmaps; si no, con el cubo de agregados (build_aggregate_cube).
+    """
+    if segments is not None and col in segments["index"]["matrices"]:
+        counts = segment_counts(segments["index"], col, segments["within"])["count"]
+        counts = counts.sort_values(ascending=False, kind="stable")
+        if normalize:
+            counts = counts / counts.sum()
+    elif cube is not None and col in cube["dims"]:
+        counts = cube_counts(cube, col).sort_values(ascending=False, kind="stable")
+        if normalize:
+            counts = counts / counts.sum()
+    else:
+        counts = df[col].value_counts(normalize=normalize)
+    counts = counts[counts > 0]
+    out = counts.rename_axis(col).reset_index(name="proporcion" if normalize else "count")
+    out[col] = out[col].astype(str)
+    return out
+
+
+# Texto de los gráficos por categoría cuando la selección no tiene valores
+_NO_CATEGORY_TEXT = "No hay clientes con valores en esta variable para la selección actual."
+
+
+def get_marital_distribution_figure(df: pd.DataFrame, cube: dict | None = None,
+                                    segments: dict | None = None):
+    counts = _category_counts(df, "marital", normalize=True, cube=cube, segments=segments)
     mapping = {
         "married": "Casado/a",
         "single": "Soltero/a",
@@ -148,6 +287,8 @@ def get_marital_distribution_figure(df: pd.DataFrame):
     fig.update_yaxes(tickformat=".0%")
     fig = _fix_plotly(fig)
 
+    if counts.empty:
+        return fig, _NO_CATEGORY_TEXT
     top_row = counts.iloc[0]
     texto = (
         f"El estado civil predominante es **{top_row['marital_es']}**, "
@@ -156,9 +297,9 @@ def get_marital_distribution_figure(df: pd.DataFrame):
     return fig, texto
 
 
-def get_job_distribution_figure(df: pd.DataFrame):
-    counts = df["job"].value_counts().reset_index()
-    counts.columns = ["job", "count"]
+def get_job_distribution_figure(df: pd.DataFrame, cube: dict | None = None,
+                                segments: dict | None = None):
+    counts = _category_counts(df, "job", cube=cube, segments=segments)
     fig = px.bar(
         counts,
         x="job",
@@ -168,6 +309,8 @@ def get_job_distribution_figure(df: pd.DataFrame):
     fig.update_xaxes(tickangle=40)
     fig = _fix_plotly(fig, height=430)
 
+    if counts.empty:
+        return fig, _NO_CATEGORY_TEXT
     top_row = counts.iloc[0]
     texto = (
         f"El grupo laboral más frecuente es **{top_row['job']}**, "
@@ -176,9 +319,9 @@ def get_job_distribution_figure(df: pd.DataFrame):
     return fig, texto
 
 
-def get_education_distribution_figure(df: pd.DataFrame):
-    counts = df["education"].value_counts(normalize=True).reset_index()
-    counts.columns = ["education", "proporcion"]
+def get_education_distribution_figure(df: pd.DataFrame, cube: dict | None = None,
+                                      segments: dict | None = None):
+    counts = _category_counts(df, "education", normalize=True, cube=cube, segments=segments)
     mapping = {
         "basic.4y": "Básica (4 años)",
         "basic.6y": "Básica (6 años)",
@@ -201,6 +344,8 @@ def get_education_distribution_figure(df: pd.DataFrame):
     fig.update_yaxes(tickformat=".0%")
     fig = _fix_plotly(fig, height=430)
 
+    if counts.empty:
+        return fig, _NO_CATEGORY_TEXT
     top_row = counts.iloc[0]
     texto = (
         f"El nivel educativo más frecuente es **{top_row['education_es']}**, "
@@ -233,9 +378,9 @@ def _map_yes_no_unknown(series: pd.Series, tipo: str):
     return series.map(mapping).fillna(series)
 
 
-def get_binary_financial_figure(df: pd.DataFrame, col: str, titulo: str):
-    counts = df[col].value_counts(normalize=True).reset_index()
-    counts.columns = [col, "proporcion"]
+def get_binary_financial_figure(df: pd.DataFrame, col: str, titulo: str,
+                                cube: dict | None = None, segments: dict | None = None):
+    counts = _category_counts(df, col, normalize=True, cube=cube, segments=segments)
     counts["label_es"] = _map_yes_no_unknown(counts[col], col)
     fig = px.bar(
         counts,
@@ -247,6 +392,8 @@ def get_binary_financial_figure(df: pd.DataFrame, col: str, titulo: str):
     fig.update_yaxes(tickformat=".0%")
     fig = _fix_plotly(fig)
 
+    if counts.empty:
+        return fig, _NO_CATEGORY_TEXT
     top_row = counts.iloc[0]
     texto = (
         f"La categoría dominante es **{top_row['label_es']}**, "
@@ -255,9 +402,9 @@ def get_binary_financial_figure(df: pd.DataFrame, col: str, titulo: str):
     return fig, texto
 
 
-def get_target_distribution_figure(df: pd.DataFrame):
-    counts = df["y"].value_counts(normalize=True).reset_index()
-    counts.columns = ["y", "proporcion"]
+def get_target_distribution_figure(df: pd.DataFrame, cube: dict | None = None,
+                                   segments: dict | None = None):
+    counts = _category_counts(df, "y", normalize=True, cube=cube, segments=segments)
     mapping = {"yes": "Contrató el depósito", "no": "No contrató el depósito"}
     counts["y_es"] = counts["y"].map(mapping).fillna(counts["y"])
     fig = px.bar(
@@ -270,7 +417,9 @@ def get_target_distribution_figure(df: pd.DataFrame):
     fig.update_yaxes(tickformat=".0%")
     fig = _fix_plotly(fig)
 
-    prop_yes = counts.loc[counts["y"] == "yes", "proporcion"].iloc[0]
+    # Sin fila "yes" (ninguna conversión en la selección) la proporción es 0
+    yes = counts.loc[counts["y"] == "yes", "proporcion"]
+    prop_yes = float(yes.iloc[0]) if not yes.empty else 0.0
     texto = (
         f"Solo alrededor del {prop_yes*100:.1f}% de los clientes terminó contratando "
         "el depósito, lo que confirma un fuerte desbalance en la variable objetivo."
@@ -282,11 +431,21 @@ def get_target_distribution_figure(df: pd.DataFrame):
 # Mapa geográfico
 # ======================
 
-def get_geo_density_figure(df: pd.DataFrame):
+# Modo del mapa: "density" (rejilla 2D calculada en el servidor, el tamaño
+# de la figura depende de la resolución y no del nº de clientes) o
+# "scatter" (un punto por cliente, como antes).
+GEO_MODE = os.environ.get("EDA_GEO_MODE", "density").strip().lower()
+GEO_GRID_SIZE = (160, 100)   # celdas (longitud, latitud) de la rejilla
+
+
+def get_geo_density_figure(df: pd.DataFrame, geo_coords: dict | None = None,
+                           x_range=None, y_range=None):
     """
-    En lugar de un mapa de densidad, se muestra un diagrama de dispersión
-    de las coordenadas (longitude, latitude) con alta transparencia para
-    visualizar la concentración de puntos sin saturar la figura.
+    Concentración de clientes por coordenadas (longitude, latitude).
+    En modo "density" se agregan las coordenadas en una rejilla fija con
+    np.histogram2d (geo_coords = build_geo_coords(df)); x_range / y_range
+    limitan la rejilla a la zona visible para re-agregar al hacer zoom.
+    En modo "scatter" se dibuja un punto por cliente con alta transparencia.
     """
     if "latitude" not in df.columns or "longitude" not in df.columns:
         return None, (
@@ -294,7 +453,62 @@ def get_geo_density_figure(df: pd.DataFrame):
             "necesarias para representar las coordenadas."
         )
 
-    geo_df = df.dropna(subset=["latitude", "longitude"]).copy()
+    if GEO_MODE == "scatter":
+        return _geo_scatter_figure(df)
+
+    if geo_coords is None:
+        geo_df = df[["longitude", "latitude"]].dropna()
+        geo_coords = {"lon": geo_df["longitude"].to_numpy(dtype="float64"),
+                      "lat": geo_df["latitude"].to_numpy(dtype="float64")}
+    lon, lat = geo_coords["lon"], geo_coords["lat"]
+    if len(lon) == 0:
+        return None, "No hay coordenadas válidas para representar en el gráfico."
+
+    x_range = list(x_range) if x_range else [lon.min(), lon.max()]
+    y_range = list(y_range) if y_range else [lat.min(), lat.max()]
+    counts, x_edges, y_edges = np.histogram2d(
+        lon, lat, bins=GEO_GRID_SIZE, range=[x_range, y_range]
+    )
+
+    # Celdas vacías transparentes; z va en filas = latitud (float32 → JSON más compacto)
+    z = np.where(counts.T > 0, counts.T, np.nan).astype("float32")
+    fig = go.Figure(
+        go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=z,
+            colorscale="Blues",
+            colorbar=dict(title="Clientes"),
+            hovertemplate="Longitud %{x:.2f}<br>Latitud %{y:.2f}<br>Clientes %{z}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title="Densidad de clientes por coordenadas",
+        uirevision="geo",   # conserva el zoom al re-agregar
+    )
+
+    # Ejes con nombres claros
+    fig.update_xaxes(title="Longitud", range=x_range)
+    fig.update_yaxes(title="Latitud", range=y_range)
+
+    # Usamos el helper común para compactar la figura
+    fig = _fix_plotly(fig, height=500)
+
+    texto = (
+        "Cada celda de la rejilla muestra cuántos clientes hay en esa zona según sus "
+        "coordenadas (longitud, latitud); los tonos más oscuros indican áreas con más "
+        "clientes. Al hacer zoom la rejilla se recalcula para la zona visible. Es útil "
+        "para detectar patrones o agrupaciones generales en los datos geográficos."
+    )
+    return fig, texto
+
+
+def _geo_scatter_figure(df: pd.DataFrame):
+    """
+    Diagrama de dispersión de las coordenadas (longitude, latitude) con alta
+    transparencia para visualizar la concentración de puntos sin saturar la figura.
+    """
+    geo_df = df.dropna(subset=["latitude", "longitude"])
     if geo_df.empty:
         return None, "No hay coordenadas válidas para representar en el gráfico."
 
@@ -321,6 +535,28 @@ def get_geo_density_figure(df: pd.DataFrame):
     )
     return fig, texto
 
+
+def geo_ranges_from_relayout(relayout: dict | None):
+    """
+    Rangos visibles (x_range, y_range) a partir del relayoutData de Plotly.
+    Devuelve (None, None) si se ha restablecido el zoom (autorange) y
+    False si el evento no cambia los ejes (p.ej. un autosize).
+    """
+    if not relayout:
+        return False
+    if relayout.get("xaxis.autorange") or relayout.get("yaxis.autorange"):
+        return None, None
+
+    def _axis(name):
+        if f"{name}.range[0]" in relayout:
+            return [relayout[f"{name}.range[0]"], relayout[f"{name}.range[1]"]]
+        return relayout.get(f"{name}.range")
+
+    x_range, y_range = _axis("xaxis"), _axis("yaxis")
+    if x_range is None and y_range is None:
+        return False
+    return x_range, y_range
+
 # ======================
 # Estadísticos y textos globales
 # ======================
@@ -448,16 +684,35 @@ def get_descriptive_table(df: pd.DataFrame) -> pd.DataFrame:
     return desc
 
 
-def generate_summary_metrics(df: pd.DataFrame) -> dict:
+def _segment_share(segments: dict, col: str, value: str):
+    """% de clientes de la selección con `col` == `value`, contado con bitmaps."""
+    index, within = segments["index"], segments["within"]
+    if col not in index["bitmaps"]:
+        return None
+    bitmap = segment(index, col, value)
+    total = index["n"]
+    if within is not None:
+        bitmap = segment_intersect(bitmap, within)
+        total = segment_count(within)
+    return segment_count(bitmap) / total * 100 if total else None
+
+
+def generate_summary_metrics(df: pd.DataFrame, segments: dict | None = None) -> dict:
     total = len(df)
     n_vars = df.shape[1]
 
-    pos_rate = df["y_bin"].mean() * 100 if "y_bin" in df.columns else None
     avg_age = df["age"].mean() if "age" in df.columns else None
     avg_income = df["Income"].mean() if "Income" in df.columns else None
 
-    housing_yes = (df["housing"] == "yes").mean() * 100 if "housing" in df.columns else None
-    loan_yes = (df["loan"] == "yes").mean() * 100 if "loan" in df.columns else None
+    if segments is not None:
+        # Proporciones desde el índice de segmentos, sin comparar columnas
+        pos_rate = _segment_share(segments, "y", "yes")
+        housing_yes = _segment_share(segments, "housing", "yes")
+        loan_yes = _segment_share(segments, "loan", "yes")
+    else:
+        pos_rate = df["y_bin"].mean() * 100 if "y_bin" in df.columns else None
+        housing_yes = (df["housing"] == "yes").mean() * 100 if "housing" in df.columns else None
+        loan_yes = (df["loan"] == "yes").mean() * 100 if "loan" in df.columns else None
 
     return {
         "total_registros": int(total),
@@ -500,14 +755,26 @@ def generate_conclusions_text(df: pd.DataFrame) -> str:
 def _conversion_by_numeric(
     df: pd.DataFrame,
     col: str,
-    bins: int | list,
     title: str,
-    xlabel: str
+    xlabel: str,
+    cube: dict | None = None,
 ):
     """
     Calcula tasa de conversión (media de y_bin) por tramos de una variable numérica
     y devuelve una figura de barras + un texto resumen.
+    Los tramos son los de conversion_bins; si el cubo de agregados trae el
+    marginal de `col`, se usa directamente sin recorrer el DataFrame.
     """
+    if cube is not None and col in cube["numeric"]:
+        marginal = cube["numeric"][col]
+        if marginal["n_valid"] == 0:
+            return None, f"No hay datos válidos para calcular la conversión por {col}."
+        conv = marginal["table"].copy()
+        conv["mean"] = conv["y_sum"] / conv["count"].where(conv["count"] > 0)
+        conv["mean_pct"] = conv["mean"] * 100
+        conv["bin_label"] = conv["bin"].astype(str)
+        return _conversion_bar_figure(conv, title, xlabel)
+
     if col not in df.columns or "y_bin" not in df.columns:
         return None, f"No se puede calcular la conversión por {col}."
 
@@ -518,12 +785,12 @@ def _conversion_by_numeric(
     # Discretizamos en bins → esto crea Interval
     aux["bin"] = pd.cut(
         aux[col],
-        bins=bins,
+        bins=conversion_bins(df, col),
         include_lowest=True
     )
 
     conv = (
-        aux.groupby("bin")["y_bin"]
+        aux.groupby("bin", observed=False)["y_bin"]
         .agg(["mean", "count"])
         .reset_index()
     )
@@ -532,6 +799,11 @@ def _conversion_by_numeric(
     # ⚠️ IMPORTANTE: convertir Interval a string para Plotly/Dash
     conv["bin_label"] = conv["bin"].astype(str)
 
+    return _conversion_bar_figure(conv, title, xlabel)
+
+
+def _conversion_bar_figure(conv: pd.DataFrame, title: str, xlabel: str):
+    """Figura de barras de conversión a partir de columnas bin_label / mean_pct."""
     fig = px.bar(
         conv,
         x="bin_label",          # ← usamos el texto, no el Interval
@@ -553,79 +825,106 @@ def _conversion_by_numeric(
     return fig, texto
 
 
-def get_conversion_by_age_figure(df: pd.DataFrame):
+def _bin_labels(bins) -> list:
+    """Etiquetas de texto idénticas a las que genera pd.cut(include_lowest=True)."""
+    empty = pd.cut(pd.Series([], dtype="float64"), bins=bins, include_lowest=True)
+    return [str(interval) for interval in empty.cat.categories]
+
+
+def get_conversion_by_age_figure(df: pd.DataFrame, cube: dict | None = None):
     if "age" not in df.columns:
         return None, "No se dispone de la variable edad."
 
-    # Bins por décadas aproximadas
-    bins = [18, 30, 40, 50, 60, 80]
+    # Bins por décadas aproximadas (AGE_BINS)
     title = "Tasa de conversión por rangos de edad"
     xlabel = "Rangos de edad (años)"
 
-    return _conversion_by_numeric(df, "age", bins, title, xlabel)
+    return _conversion_by_numeric(df, "age", title, xlabel, cube=cube)
+
+def get_conversion_by_age_range_figure(age_index: dict, rango_edad=None):
+    """
+    Igual que get_conversion_by_age_figure sobre las filas del rango de edad,
+    pero calculado con el índice ordenado por edad (ver build_age_index):
+    no filtra ni copia el DataFrame, el coste solo depende del nº de tramos.
+    """
+    age_min = age_max = None
+    if rango_edad and len(rango_edad) == 2:
+        age_min, age_max = rango_edad
+
+    # Sin ninguna fila en el rango → mismo mensaje que _conversion_by_numeric
+    in_range = age_index_bin_stats(age_index, [-np.inf, np.inf], age_min, age_max)[0]
+    if in_range.sum() == 0:
+        return None, "No hay datos válidos para calcular la conversión por age."
+
+    counts, y_sums = age_index_bin_stats(age_index, AGE_BINS, age_min, age_max)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(counts > 0, y_sums / counts, np.nan)
+
+    conv = pd.DataFrame({
+        "bin_label": _bin_labels(AGE_BINS),
+        "mean_pct": mean * 100,
+        "count": counts,
+    })
+    return _conversion_bar_figure(
+        conv, "Tasa de conversión por rangos de edad", "Rangos de edad (años)"
+    )
+
 
-def get_conversion_by_income_figure(df: pd.DataFrame):
+def get_conversion_by_income_figure(df: pd.DataFrame, cube: dict | None = None):
     if "Income" not in df.columns:
         return None, "No se dispone de la variable de ingresos."
 
-    # Bins por tramos de ingreso (ajusta si lo ves necesario)
-    q = df["Income"].dropna().quantile([0, 0.25, 0.5, 0.75, 1]).values
-    # Evitar bins duplicados si hay muchos valores iguales
-    bins = sorted(set(q))
-
+    # Bins por cuartiles de ingreso (ver conversion_bins)
     title = "Tasa de conversión por nivel de ingresos"
     xlabel = "Tramos de ingresos"
 
-    return _conversion_by_numeric(df, "Income", bins, title, xlabel)
+    return _conversion_by_numeric(df, "Income", title, xlabel, cube=cube)
 
-def get_conversion_by_webvisits_figure(df: pd.DataFrame):
+def get_conversion_by_webvisits_figure(df: pd.DataFrame, cube: dict | None = None):
     if "NumWebVisitsMonth" not in df.columns:
         return None, "No se dispone de la variable visitas web/mes."
 
-    # Bins por nº de visitas
-    max_vis = int(df["NumWebVisitsMonth"].max())
-    bins = list(range(0, max_vis + 2))  # 0-1,1-2,...
-
+    # Bins por nº de visitas: 0-1, 1-2, ...
     title = "Tasa de conversión según número de visitas web al mes"
     xlabel = "Número de visitas web/mes"
 
-    return _conversion_by_numeric(df, "NumWebVisitsMonth", bins, title, xlabel)
+    return _conversion_by_numeric(df, "NumWebVisitsMonth", title, xlabel, cube=cube)
 
-def get_conversion_by_previous_figure(df: pd.DataFrame):
+def get_conversion_by_previous_figure(df: pd.DataFrame, cube: dict | None = None):
     if "previous" not in df.columns:
         return None, "No se dispone de la variable de contactos previos."
 
-    max_prev = int(df["previous"].max())
-    bins = list(range(0, max_prev + 2))
-
     title = "Tasa de conversión según contactos previos"
     xlabel = "Número de contactos previos"
 
-    return _conversion_by_numeric(df, "previous", bins, title, xlabel)
+    return _conversion_by_numeric(df, "previous", title, xlabel, cube=cube)
 
-def get_logistic_age_curve_figure(df: pd.DataFrame):
+def get_logistic_age_curve_figure(df: pd.DataFrame, model: dict | None = None):
+    """
+    Curva de probabilidad de un modelo logístico edad → contratación.
+    `model` es el modelo ya ajustado (build_logistic_age_model); sin él se
+    ajusta aquí. La curva se evalúa en forma cerrada, sin scikit-learn.
+    """
     if "age" not in df.columns or "y_bin" not in df.columns:
         return None, "No se dispone de edad y/o variable objetivo para ajustar la curva."
 
-    aux = df[["age", "y_bin"]].dropna()
-    if aux.empty:
+    if model is None:
+        if df[["age", "y_bin"]].dropna().empty:
+            return None, "No hay datos suficientes para ajustar una curva logística."
+        try:
+            model = fit_logistic_age_model(df)
+        except np.linalg.LinAlgError:
+            return None, "No se ha podido ajustar el modelo logístico."
+    if len(model["stats"]["age"]) == 0:
         return None, "No hay datos suficientes para ajustar una curva logística."
 
-    X = aux[["age"]].values
-    y = aux["y_bin"].values
-
-    try:
-        model = LogisticRegression()
-        model.fit(X, y)
-    except Exception:
-        return None, "No se ha podido ajustar el modelo logístico."
-
-    age_min, age_max = np.percentile(aux["age"], [2, 98])
-    age_grid = np.linspace(age_min, age_max, 100).reshape(-1, 1)
-    proba = model.predict_proba(age_grid)[:, 1] * 100  # en %
+    age_min, age_max = logistic_age_percentiles(model, [2, 98])
+    age_grid = np.linspace(age_min, age_max, 100)
+    proba = logistic_age_proba(model, age_grid) * 100  # en %
 
     fig = px.line(
-        x=age_grid.ravel(),
+        x=age_grid,
         y=proba,
         labels={"x": "Edad", "y": "Probabilidad de contratación (%)"},
         title="Curva logística (edad → probabilidad de contratación)",
@@ -685,19 +984,17 @@ def get_target_correlation_heatmap(df: pd.DataFrame):
 
 import plotly.express as px
 
-def get_target_donut_figure(df: pd.DataFrame):
+def get_target_donut_figure(df: pd.DataFrame, cube: dict | None = None,
+                            segments: dict | None = None):
     """
     Donut de la variable objetivo (Contrato depósito: sí / no).
     """
     if "y" not in df.columns:
         return px.scatter(title="No se encuentra la variable objetivo 'y'")
 
-    datos = (
-        df["y"]
-        .value_counts(dropna=False)
-        .rename_axis("Contrato")
-        .reset_index(name="Cuenta")
-    )
+    datos = _category_counts(df, "y", cube=cube, segments=segments).rename(columns={"y": "Contrato", "count": "Cuenta"})
+    if datos.empty:
+        return px.scatter(title="No hay clientes con valor de 'y' en la selección")
 
     fig = px.pie(
         datos,
@@ -714,19 +1011,19 @@ def get_target_donut_figure(df: pd.DataFrame):
     return fig
 
 
-def get_marital_donut_figure(df: pd.DataFrame):
+def get_marital_donut_figure(df: pd.DataFrame, cube: dict | None = None,
+                             segments: dict | None = None):
     """
     Donut del estado civil de los clientes.
     """
     if "marital" not in df.columns:
         return px.scatter(title="No se encuentra la variable 'marital'")
 
-    datos = (
-        df["marital"]
-        .value_counts(dropna=False)
-        .rename_axis("Estado_civil")
-        .reset_index(name="Cuenta")
+    datos = _category_counts(df, "marital", cube=cube, segments=segments).rename(
+        columns={"marital": "Estado_civil", "count": "Cuenta"}
     )
+    if datos.empty:
+        return px.scatter(title="No hay clientes con estado civil en la selección")
 
     fig = px.pie(
         datos,
@@ -0,0 +1,418 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import data.load_to_postgres as loader
+import views.layout as layout
+from models.data_model import BANK_PATH, FILTER_COLUMNS, get_memory_stats, load_data
+
+# ============= COMPROBACIONES DEL DASHBOARD =============
+#
+# Comprobaciones de extremo a extremo sobre el dataset real. Cada una
+# imprime su resultado y el script sale con código 1 si alguna falla.
+#
+#   python dashboard_checks.py                       # todas
+#   python dashboard_checks.py concurrencia --hilos 16 --rondas 5
+#   python dashboard_checks.py memoria --procesos 4
+#   python dashboard_checks.py filtros-procesos
+#   python dashboard_checks.py filtros-extremos
+#   python dashboard_checks.py load-to-postgres --bloque 10000
+#
+# ========================================================
+
+
+def _render_tabs(tabs, filters=None) -> dict:
+    return {tab: layout.render_tab(tab, filters) for tab in tabs}
+
+
+def _image_files(directory: Path) -> dict:
+    """{nombre: bytes} de los PNG y metadatos .json escritos en la cache de imágenes."""
+    return {p.name: p.read_bytes() for p in sorted(directory.glob("*")) if p.suffix in (".png", ".json")}
+
+
+def _image_errors(files: dict, expected: dict) -> list:
+    """Diferencias de una cache de imágenes frente a la del render en serie."""
+    errores = []
+    if files.keys() != expected.keys():
+        errores.append(f"ficheros distintos: sobran {sorted(files.keys() - expected.keys())}, "
+                       f"faltan {sorted(expected.keys() - files.keys())}")
+    for name in sorted(files.keys() & expected.keys()):
+        if files[name] != expected[name]:
+            errores.append(f"{name}: bytes distintos")
+        elif name.endswith(".png") and hashlib.sha256(files[name]).hexdigest()[:20] != name[:-4]:
+            errores.append(f"{name}: el contenido no corresponde a su nombre")
+    return errores
+
+
+def check_concurrencia(args) -> bool:
+    """
+    Render en paralelo de las pestañas (render_tab desde varios hilos, cada
+    uno con sus secciones en paralelo) frente a un render en serie: el
+    contenido debe ser idéntico, y también los PNG (byte a byte) y metadatos
+    escritos en la cache de imágenes. Cada ronda parte sin cache de payloads
+    ni de imágenes, así que todas las secciones se calculan a la vez.
+    """
+    tabs = layout.TAB_NAMES
+    workers = layout.SECTION_WORKERS
+    image_dir = layout.IMAGE_CACHE_DIR
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Referencia: una pestaña detrás de otra y una sección detrás de otra
+            layout.SECTION_WORKERS = 1
+            layout.IMAGE_CACHE_DIR = Path(tmp) / "serie"
+            layout.clear_payload_cache()
+            t0 = time.perf_counter()
+            expected = _render_tabs(tabs)
+            expected_images = _image_files(layout.IMAGE_CACHE_DIR)
+            print(f"[INFO] Render en serie: {time.perf_counter() - t0:.2f} s, "
+                  f"{sum(n.endswith('.png') for n in expected_images)} PNG")
+            if not expected_images:
+                print("[AVISO] El render en serie no ha escrito ninguna imagen.")
+                ok = False
+
+            layout.SECTION_WORKERS = workers
+            for ronda in range(1, args.rondas + 1):
+                layout.IMAGE_CACHE_DIR = Path(tmp) / f"ronda-{ronda}"
+                layout.clear_payload_cache()
+                jobs = [tabs[i % len(tabs)] for i in range(args.hilos * len(tabs))]
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+                    results = list(pool.map(layout.render_tab, jobs))
+                distintas = sorted({tab for tab, payload in zip(jobs, results)
+                                    if payload != expected[tab]})
+                print(f"[INFO] Ronda {ronda}: {len(jobs)} renders con {args.hilos} hilos "
+                      f"en {time.perf_counter() - t0:.2f} s")
+                if distintas:
+                    print(f"[AVISO] Ronda {ronda}: difieren del render en serie: {', '.join(distintas)}")
+                    ok = False
+                for error in _image_errors(_image_files(layout.IMAGE_CACHE_DIR), expected_images):
+                    print(f"[AVISO] Ronda {ronda}, cache de imágenes: {error}")
+                    ok = False
+    finally:
+        layout.SECTION_WORKERS = workers
+        layout.IMAGE_CACHE_DIR = image_dir
+        layout.clear_payload_cache()
+    return ok
+
+
+def _image_sources(node) -> list:
+    """src de las imágenes (html.Img) de un payload JSON, en orden."""
+    if isinstance(node, list):
+        return [src for child in node for src in _image_sources(child)]
+    if not isinstance(node, dict) or "props" not in node:
+        return []
+    own = [node["props"]["src"]] if node.get("type") == "Img" else []
+    return own + _image_sources(node["props"].get("children"))
+
+
+def check_filtros_procesos(args) -> bool:
+    """
+    Pestaña de variables numéricas con EDA_SECTION_EXECUTOR=process: con un
+    filtro activo, las imágenes deben ser las del subconjunto (distintas de
+    las del dataset completo) e iguales a las del render en hilos.
+    """
+    filters = {"age": [30, 40]}
+    executor = layout.SECTION_EXECUTOR
+    try:
+        sources = {}
+        for modo, flt in (("process", None), ("process", filters), ("thread", filters)):
+            layout.SECTION_EXECUTOR = modo
+            layout.clear_payload_cache()
+            sources[(modo, bool(flt))] = _image_sources(layout.render_tab("tab-numericas", flt))
+    finally:
+        layout.SECTION_EXECUTOR = executor
+        layout.clear_payload_cache()
+
+    completo = sources[("process", False)]
+    filtrado, hilos = sources[("process", True)], sources[("thread", True)]
+    ok = True
+    if not filtrado or any(a == b for a, b in zip(completo, filtrado)):
+        print("[AVISO] Con procesos y filtros se sirven imágenes del dataset completo.")
+        ok = False
+    if filtrado != hilos:
+        print("[AVISO] Las imágenes filtradas difieren entre procesos e hilos.")
+        ok = False
+    if ok:
+        print(f"[INFO] {len(filtrado)} imágenes filtradas, iguales en procesos e hilos.")
+    return ok
+
+
+def _extreme_filters(df) -> dict:
+    """
+    Filtros de la barra (solo categóricos) que dejan casos límite: una
+    combinación con clientes pero sin ninguna conversión y otra con un
+    único cliente. Se buscan en los datos, no se fijan a mano.
+    """
+    cols = [c for c in FILTER_COLUMNS if c in df.columns]
+    groups = df.groupby(cols, observed=True)["y_bin"].agg(["size", "sum"])
+    found = {}
+    for name, mask in (("sin conversiones", (groups["size"] > 1) & (groups["sum"] == 0)),
+                       ("un solo cliente", groups["size"] == 1)):
+        if mask.any():
+            values = groups.index[mask.to_numpy()][0]
+            found[name] = {col: [str(v)] for col, v in zip(cols, values)}
+    return found
+
+
+def check_filtros_extremos(args) -> bool:
+    """
+    Todas las pestañas con filtros que dejan una selección sin ninguna
+    conversión (y = "yes") o con un solo cliente: se deben generar sin
+    errores, sin depender de que exista cada categoría.
+    """
+    ok = True
+    for name, filters in _extreme_filters(load_data()).items():
+        layout.clear_payload_cache()
+        fallos = 0
+        for tab in layout.TAB_NAMES:
+            try:
+                layout.render_tab(tab, filters)
+            except Exception as exc:   # cualquier fallo de una sección rompe la pestaña
+                print(f"[AVISO] {tab} falla con filtros «{name}» {filters}: {exc!r}")
+                fallos += 1
+        ok = ok and not fallos
+        if not fallos:
+            print(f"[INFO] Filtros «{name}»: todas las pestañas generadas.")
+    layout.clear_payload_cache()
+    return ok
+
+
+# Proceso del servidor simulado: carga el dataset desde el snapshot, recorre
+# las columnas numéricas (como al calcular las figuras) e informa de su memoria
+_WORKER_CODE = """
+import json, sys
+import models.data_model as dm
+base = dm.get_memory_stats()
+df = dm.load_data()
+for col in df.select_dtypes("number").columns:
+    df[col].sum()
+stats = dm.get_memory_stats()
+stats["anon_delta_mb"] = round(stats["anon_mb"] - base["anon_mb"], 1)
+print(json.dumps(stats), flush=True)
+sys.stdin.read()
+"""
+
+
+def _start_workers(shared: bool, count: int) -> list:
+    """Arranca `count` procesos con EDA_SHARED_DATASET=0/1 y devuelve su memoria ya cargados."""
+    env = dict(os.environ, EDA_DATA_SOURCE="snapshot", EDA_SHARED_DATASET="1" if shared else "0")
+    procs, stats = [], []
+    try:
+        for _ in range(count):
+            procs.append(subprocess.Popen(
+                [sys.executable, "-c", _WORKER_CODE], cwd=Path(__file__).resolve().parent,
+                env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            ))
+        # Todos siguen vivos (esperando en stdin) mientras se leen los demás
+        for proc in procs:
+            line = next((l for l in proc.stdout if l.startswith("{")), None)
+            if line is None:
+                raise RuntimeError("un proceso de prueba terminó sin informar de su memoria")
+            stats.append(json.loads(line))
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return stats
+
+
+def check_memoria(args) -> bool:
+    """
+    Memoria de varios procesos del servidor con el dataset compartido
+    (EDA_SHARED_DATASET=1, columnas sobre el snapshot mapeado) frente a la
+    copia por proceso: la memoria anónima que añade cada proceso al cargar
+    debe ser menor con el dataset compartido.
+    """
+    if get_memory_stats() is None:
+        print("[AVISO] Sin /proc/self/smaps_rollup (no es Linux): comprobación omitida.")
+        return True
+
+    results = {}
+    for shared in (False, True):
+        stats = _start_workers(shared, args.procesos)
+        modo = "compartido" if shared else "copia"
+        anon = sum(s["anon_delta_mb"] for s in stats) / len(stats)
+        pss = sum(s["pss_mb"] for s in stats)
+        results[shared] = anon
+        print(f"[INFO] {modo:<10}: {args.procesos} procesos, +{anon:.1f} MB anónimos por proceso "
+              f"al cargar, PSS total {pss:.1f} MB")
+
+    if results[True] >= results[False]:
+        print("[AVISO] El dataset compartido no reduce la memoria anónima por proceso.")
+        return False
+    return True
+
+
+class _FakeCursor:
+    """Cursor psycopg2 de pega: guarda las sentencias y las filas de cada COPY."""
+
+    def __init__(self):
+        self.statements = []
+        self.copies = []    # (sql, filas del bloque como listas de texto)
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buf):
+        self.copies.append((sql, list(csv.reader(buf))))
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.cur = _FakeCursor()
+        self.committed = self.closed = False
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        self.closed = True
+
+
+def _expected_pg_type(dtype) -> str:
+    kind = dtype.kind
+    if kind == "b":
+        return "BOOLEAN"
+    if kind in "iu":
+        return "BIGINT"
+    if kind == "f":
+        return "DOUBLE PRECISION"
+    if kind == "M":
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _check_loaded_table(table: str, df: pd.DataFrame, conn: _FakeConnection, chunksize: int) -> list:
+    """Errores de la carga de una tabla en la conexión de pega (lista vacía si es correcta)."""
+    errores = []
+    cols = ", ".join(f'"{c}" {_expected_pg_type(t)}' for c, t in df.dtypes.items())
+    ddl = [f'DROP TABLE IF EXISTS "{table}"', f'CREATE TABLE "{table}" ({cols})']
+    if conn.cur.statements[:2] != ddl:
+        errores.append(f"DDL inesperado: {conn.cur.statements[:2]}")
+
+    quoted = ", ".join(f'"{c}"' for c in df.columns)
+    copy_sql = f'COPY "{table}" ({quoted}) FROM STDIN WITH (FORMAT csv)'
+    if any(sql != copy_sql for sql, _ in conn.cur.copies):
+        errores.append("sentencia COPY inesperada")
+    sizes = [len(rows) for _, rows in conn.cur.copies]
+    expected_sizes = [min(chunksize, len(df) - start) for start in range(0, len(df), chunksize)]
+    if sizes != expected_sizes:
+        errores.append(f"filas por bloque {sizes}, se esperaban {expected_sizes}")
+
+    # Los bloques seguidos deben ser el DataFrame completo, en orden y sin repetir filas
+    rows = [row for _, block in conn.cur.copies for row in block]
+    if rows != list(csv.reader(io.StringIO(df.to_csv(index=False, header=False)))):
+        errores.append("el contenido enviado con COPY no coincide con el DataFrame")
+
+    key = loader.JOIN_KEYS.get(table)
+    if key in df.columns and f'CREATE INDEX "ix_{table}_{key}" ON "{table}" ("{key}")' not in conn.cur.statements:
+        errores.append(f"falta el índice sobre {key}")
+    if not (conn.committed and conn.closed):
+        errores.append("la conexión no se confirma y cierra")
+    return errores
+
+
+def check_load_to_postgres(args) -> bool:
+    """
+    Carga masiva de load_to_postgres (bulk_load_all → create_typed_table +
+    copy_dataframe) contra conexiones de pega: DDL con columnas tipadas,
+    una sentencia COPY por bloque de --bloque filas con el contenido
+    completo, índice sobre la clave de unión y commit. No necesita PostgreSQL.
+    """
+    csv_path = loader.CSV_PATH
+    try:
+        loader.CSV_PATH = BANK_PATH
+        df_bank = loader.load_bank_additional()
+    finally:
+        loader.CSV_PATH = csv_path
+    # Tabla pequeña con un tipo de cada (entero, real, booleano, fecha, texto y nulos)
+    df_cust = pd.DataFrame({
+        "ID": ["a1", "b2", None, "d,4"],
+        "Income": [58138, 46344, 71613, 26646],
+        "Kidhome": [0.0, 1.0, None, 1.0],
+        "Activo": [True, False, True, True],
+        "Dt_Customer": pd.to_datetime(["2012-09-04", "2014-03-08", "2013-08-21", "2014-02-10"]),
+    })
+    tables = {"bank_additional": df_bank, "customer_details": df_cust}
+
+    conns = []
+    def _connect():
+        conns.append(_FakeConnection())
+        return conns[-1]
+
+    resultados = loader.bulk_load_all(_connect, tables, args.bloque)
+    ok = True
+    for r in resultados:
+        table, df = r["tabla"], tables[r["tabla"]]
+        conn = next(c for c in conns if f'"{table}"' in c.cur.statements[0])
+        errores = _check_loaded_table(table, df, conn, args.bloque)
+        if r["filas"] != len(df):
+            errores.append(f"devuelve {r['filas']} filas, el DataFrame tiene {len(df)}")
+        for error in errores:
+            print(f"[AVISO] {table}: {error}")
+        if not errores:
+            print(f"[INFO] {table}: {len(df)} filas en {len(conn.cur.copies)} bloques COPY, DDL tipado correcto.")
+        ok = ok and not errores
+    return ok
+
+
+CHECKS = {
+    "concurrencia": check_concurrencia,
+    "memoria": check_memoria,
+    "filtros-procesos": check_filtros_procesos,
+    "filtros-extremos": check_filtros_extremos,
+    "load-to-postgres": check_load_to_postgres,
+}
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Comprobaciones de extremo a extremo del dashboard.")
+    parser.add_argument(
+        "checks",
+        nargs="*",
+        help=f"Comprobaciones a ejecutar (por defecto todas: {', '.join(CHECKS)}).",
+    )
+    parser.add_argument("--hilos", type=int, default=8, help="Hilos concurrentes (concurrencia).")
+    parser.add_argument("--rondas", type=int, default=3, help="Rondas sin cache (concurrencia).")
+    parser.add_argument("--procesos", type=int, default=4, help="Procesos del servidor simulados (memoria).")
+    parser.add_argument("--bloque", type=int, default=10_000, help="Filas por bloque COPY (load-to-postgres).")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"comprobación desconocida: {', '.join(unknown)}")
+    return args
+
+
+def main():
+    args = _parse_args()
+    load_data()
+
+    fallos = []
+    for name in args.checks or CHECKS:
+        print(f"[INFO] Comprobación: {name}")
+        if not CHECKS[name](args):
+            fallos.append(name)
+
+    if fallos:
+        print(f"[AVISO] Comprobaciones fallidas: {', '.join(fallos)}")
+        sys.exit(1)
+    print("[INFO] Todas las comprobaciones son correctas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import argparse
+import importlib.util
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from sqlalchemy import create_engine
 
@@ -14,6 +20,13 @@ PG_HOST = "localhost"
 PG_PORT = "5432"
 PG_DB_NAME = "bank_marketing"   # BD YA EXISTENTE
 
+# Carga masiva con COPY
+COPY_CHUNKSIZE = 50_000          # filas por bloque enviado a COPY FROM STDIN
+JOIN_KEYS = {                    # clave de unión de cada tabla (se indexa)
+    "bank_additional": "id_",
+    "customer_details": "ID",
+}
+
 # =========================================
 
 
@@ -35,29 +48,131 @@ def load_bank_additional() -> pd.DataFrame:
     return df
 
 
+def _excel_engine() -> str:
+    """calamine (lector en Rust, mucho más rápido) si está instalado; si no, openpyxl."""
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
 def load_customer_details() -> pd.DataFrame:
     """
     Carga TODAS las hojas del Excel customer-details.xlsx y las concatena.
+    El libro se abre y se parsea una sola vez (sheet_name=None).
     """
-    print("Cargando customer-details.xlsx (todas las hojas)...")
-    xls = pd.ExcelFile(EXCEL_PATH)
-    frames = []
-
-    for sheet in xls.sheet_names:
-        print(f" - Leyendo hoja: {sheet}")
-        tmp = pd.read_excel(EXCEL_PATH, sheet_name=sheet)
-        frames.append(tmp)
+    print(f"Cargando customer-details.xlsx (todas las hojas, motor {_excel_engine()})...")
+    sheets = pd.read_excel(
+        EXCEL_PATH,
+        sheet_name=None,
+        engine=_excel_engine(),
+        # Eliminamos columnas técnicas típicas ya en la lectura
+        usecols=lambda c: not str(c).startswith("Unnamed:"),
+        dtype={"ID": str},
+    )
+    for sheet, tmp in sheets.items():
+        print(f" - Hoja {sheet}: {len(tmp)} filas")
+
+    return pd.concat(sheets.values(), ignore_index=True)
+
+
+# ============= CARGA MASIVA (COPY) =============
+
+def _pg_type(dtype) -> str:
+    """Tipo de columna PostgreSQL equivalente al dtype de pandas."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def create_typed_table(cur, table: str, df: pd.DataFrame) -> None:
+    """(Re)crea la tabla con columnas tipadas a partir de los dtypes del DataFrame."""
+    cols = ", ".join(f'"{c}" {_pg_type(t)}' for c, t in df.dtypes.items())
+    cur.execute(f'DROP TABLE IF EXISTS "{table}"')
+    cur.execute(f'CREATE TABLE "{table}" ({cols})')
+
+
+def copy_dataframe(cur, table: str, df: pd.DataFrame, chunksize: int = COPY_CHUNKSIZE) -> int:
+    """
+    Envía el DataFrame con COPY FROM STDIN en bloques de `chunksize` filas.
+    `cur` es un cursor psycopg2 (o cualquier sustituto con copy_expert()).
+    """
+    cols = ", ".join(f'"{c}"' for c in df.columns)
+    sql = f'COPY "{table}" ({cols}) FROM STDIN WITH (FORMAT csv)'
 
-    df = pd.concat(frames, ignore_index=True)
+    for start in range(0, len(df), chunksize):
+        buf = io.StringIO()
+        df.iloc[start:start + chunksize].to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cur.copy_expert(sql, buf)
+    return len(df)
 
-    # Eliminamos columnas técnicas típicas
-    if "Unnamed: 0" in df.columns:
-        df = df.drop(columns=["Unnamed: 0"])
 
-    return df
+def bulk_load_table(connect, table: str, df: pd.DataFrame,
+                    chunksize: int = COPY_CHUNKSIZE) -> dict:
+    """
+    Crea la tabla tipada, la carga con COPY y crea el índice sobre la clave
+    de unión (después de cargar, que es más rápido que mantenerlo fila a fila).
+    `connect` devuelve una conexión DB-API nueva (una por tabla/hilo).
+    """
+    t0 = time.perf_counter()
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        create_typed_table(cur, table, df)
+        rows = copy_dataframe(cur, table, df, chunksize)
+
+        key = JOIN_KEYS.get(table)
+        if key in df.columns:
+            cur.execute(f'CREATE INDEX "ix_{table}_{key}" ON "{table}" ("{key}")')
+        conn.commit()
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - t0
+    return {
+        "tabla": table,
+        "filas": rows,
+        "segundos": seconds,
+        "filas_por_segundo": rows / seconds if seconds > 0 else float("inf"),
+    }
+
+
+def bulk_load_all(connect, tables: dict, chunksize: int = COPY_CHUNKSIZE) -> list:
+    """Carga todas las tablas en paralelo (una conexión por tabla)."""
+    with ThreadPoolExecutor(max_workers=len(tables)) as pool:
+        futures = [
+            pool.submit(bulk_load_table, connect, table, df, chunksize)
+            for table, df in tables.items()
+        ]
+        return [f.result() for f in futures]
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Vuelca bank-additional y customer-details a PostgreSQL.")
+    parser.add_argument(
+        "--modo",
+        choices=["copy", "to_sql"],
+        default="copy",
+        help="copy: carga masiva con COPY FROM STDIN (por defecto); to_sql: INSERTs de pandas.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=COPY_CHUNKSIZE,
+        help=f"Filas por bloque en modo copy (por defecto {COPY_CHUNKSIZE}).",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = _parse_args()
+
     # 1. Crear engine contra la BD (YA EXISTENTE)
     engine = get_db_engine()
     print(f"Conectado a la base de datos existente: {PG_DB_NAME}")
@@ -67,11 +182,22 @@ def main():
     df_cust = load_customer_details()
 
     # 3. Volcar a PostgreSQL
-    print("Volcando tabla bank_additional...")
-    df_bank.to_sql("bank_additional", engine, if_exists="replace", index=False)
-
-    print("Volcando tabla customer_details...")
-    df_cust.to_sql("customer_details", engine, if_exists="replace", index=False)
+    if args.modo == "copy":
+        print(f"Volcando tablas con COPY (bloques de {args.chunksize} filas, en paralelo)...")
+        resultados = bulk_load_all(
+            engine.raw_connection,
+            {"bank_additional": df_bank, "customer_details": df_cust},
+            args.chunksize,
+        )
+        for r in resultados:
+            print(f" - {r['tabla']}: {r['filas']} filas en {r['segundos']:.2f} s "
+                  f"({r['filas_por_segundo']:,.0f} filas/s)")
+    else:
+        print("Volcando tabla bank_additional...")
+        df_bank.to_sql("bank_additional", engine, if_exists="replace", index=False)
+
+        print("Volcando tabla customer_details...")
+        df_cust.to_sql("customer_details", engine, if_exists="replace", index=False)
 
 
     print("Proceso completado.")
@@ -1,9 +1,20 @@
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+import time
 import warnings
 
 import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from pandas.api.types import union_categoricals
+from sqlalchemy import create_engine, text
 
 # ============================================================
 # CONFIGURACIÓN DE RUTAS
@@ -12,41 +23,176 @@ BASE_PATH = Path(__file__).resolve().parents[1] / "data"
 BANK_PATH = BASE_PATH / "bank-additional.csv"
 CUSTOMER_PATH = BASE_PATH / "customer-details.xlsx"
 MERGED_PATH = BASE_PATH / "merged_dataset.csv"
+# Snapshot columnar (Arrow/Feather sin comprimir → se puede mapear en memoria)
+SNAPSHOT_PATH = BASE_PATH / "merged_dataset.feather"
+
+# Cache de lecturas intermedias (p. ej. el Excel de clientes ya parseado)
+CACHE_DIR = BASE_PATH / ".cache"
+# Imágenes Matplotlib ya renderizadas (nombre = hash del PNG)
+IMAGE_CACHE_DIR = CACHE_DIR / "img"
+
+# Tipos aplicados al leer customer-details.xlsx
+CUSTOMER_DTYPES = {"ID": str}
+
+# Lock para que varios procesos no generen el merged a la vez
+BUILD_LOCK_PATH = BASE_PATH / ".merged_build.lock"
+
+# Manifiesto de la última construcción desde ficheros (huellas de las fuentes)
+# y clave id_ + hash de cada fila del merged, para reconstruir solo lo que cambie
+BUILD_MANIFEST_PATH = BASE_PATH / "merged_manifest.json"
+ROW_INDEX_PATH = BASE_PATH / "merged_rows.feather"
+
+# ============================================================
+# ORIGEN DE DATOS (variable de entorno EDA_DATA_SOURCE)
+# ============================================================
+#   auto     → usar snapshot/CSV si existen; si no, preguntar por consola
+#              (solo con terminal interactiva) o generar desde ficheros
+#   snapshot → usar únicamente el merged ya generado (nunca construir)
+#   files    → si falta el merged, generarlo desde CSV + Excel
+#   postgres → si falta el merged, generarlo desde PostgreSQL
+#   chunked  → si falta el merged, generarlo desde CSV + Excel por bloques
+#              (fuera de memoria, ver sección 14)
+DATA_SOURCES = ("auto", "snapshot", "files", "postgres", "chunked")
+DATA_SOURCE = os.environ.get("EDA_DATA_SOURCE", "auto").strip().lower()
 
 # ============================================================
-# CONFIGURACIÓN POSTGRES (AJUSTAR A TU ENTORNO)
+# CONFIGURACIÓN POSTGRES (AJUSTAR A TU ENTORNO O POR VARIABLES)
 # ============================================================
-PG_USER = "postgres"
-PG_PASSWORD = "admin"
-PG_HOST = "localhost"
-PG_PORT = "5432"
-PG_DB_NAME = "bank_marketing"   # BD existente donde están las tablas originales
+PG_USER = os.environ.get("EDA_PG_USER", "postgres")
+PG_PASSWORD = os.environ.get("EDA_PG_PASSWORD", "admin")
+PG_HOST = os.environ.get("EDA_PG_HOST", "localhost")
+PG_PORT = os.environ.get("EDA_PG_PORT", "5432")
+PG_DB_NAME = os.environ.get("EDA_PG_DB_NAME", "bank_marketing")   # BD existente donde están las tablas originales
+PG_CHUNKSIZE = 20_000   # filas por bloque al leer el JOIN desde PostgreSQL
 
-# Cache en memoria
-_DATA_CACHE = None
+# Columnas que usa el dashboard (todas salvo las técnicas: índices e IDs)
+BANK_COLUMNS = [
+    "age", "job", "marital", "education", "default", "housing", "loan",
+    "contact", "duration", "campaign", "pdays", "previous", "poutcome",
+    "emp.var.rate", "cons.price.idx", "cons.conf.idx", "euribor3m",
+    "nr.employed", "y", "date", "latitude", "longitude",
+]
+CUSTOMER_COLUMNS = ["Income", "Kidhome", "Teenhome", "Dt_Customer", "NumWebVisitsMonth"]
+
+# ============================================================
+# ESQUEMA DE TIPOS DEL DATASET FUSIONADO (memoria compacta)
+# ============================================================
+#   "category" → texto de baja cardinalidad
+#   "integer"  → entero con el menor ancho posible (int8/int16/int32)
+#   "float32"  → decimales donde no se necesita doble precisión
+#   "bool"     → binaria 0/1
+DTYPE_SCHEMA = {
+    "job": "category",
+    "marital": "category",
+    "education": "category",
+    "default": "category",
+    "housing": "category",
+    "loan": "category",
+    "contact": "category",
+    "poutcome": "category",
+    "y": "category",
+    "Kidhome": "integer",
+    "Teenhome": "integer",
+    "NumWebVisitsMonth": "integer",
+    "campaign": "integer",
+    "previous": "integer",
+    "pdays": "integer",
+    "duration": "integer",
+    "Income": "integer",
+    "age": "float32",
+    "emp.var.rate": "float32",
+    "cons.price.idx": "float32",
+    "cons.conf.idx": "float32",
+    "euribor3m": "float32",
+    "nr.employed": "float32",
+    "latitude": "float32",
+    "longitude": "float32",
+    "y_bin": "bool",
+}
+
+# Dataset en memoria: un único "handle" versionado que se sustituye de golpe
+#   {"version": huella, "df": DataFrame, "derived": {...}, "lock": Lock}
+# Quien lo lee se queda con su handle hasta terminar (petición en curso), y
+# la versión antigua se libera cuando nadie la referencia.
+_DATASET = None
+
+# Recarga en segundo plano (ver sección 16)
+_RELOAD_LOCK = threading.Lock()
+_RELOAD_STATUS = {"running": False, "started": None, "finished": None,
+                  "changed": None, "error": None}
+
+# Engine de PostgreSQL compartido (pool de conexiones)
+_PG_ENGINE = None
+_PG_ENGINE_LOCK = threading.Lock()
 
 
 # -------------------------------------------------------------------
 # 1. Carga de datos desde FICHEROS
 # -------------------------------------------------------------------
 def _load_raw_bank_from_files() -> pd.DataFrame:
-    """Carga el CSV bank-additional.csv desde /data."""
-    return pd.read_csv(BANK_PATH)
+    """
+    Carga el CSV bank-additional.csv desde /data: solo las columnas que usa
+    el dashboard + la clave, con las de texto ya como categóricas.
+    """
+    return pd.read_csv(
+        BANK_PATH,
+        usecols=lambda c: c in BANK_COLUMNS or c == "id_",
+        dtype=BANK_READ_DTYPES,
+    )
+
+
+def _excel_engine() -> str:
+    """calamine (lector en Rust, mucho más rápido) si está instalado; si no, openpyxl."""
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
+def _file_key(path: Path) -> str:
+    """Clave de cache de un fichero: tamaño + fecha de modificación."""
+    st = path.stat()
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def _read_customer_workbook(path: Path) -> pd.DataFrame:
+    """
+    Lee todas las hojas del libro en UNA sola pasada (sheet_name=None),
+    descartando ya en la lectura las columnas técnicas 'Unnamed: *'.
+    """
+    sheets = pd.read_excel(
+        path,
+        sheet_name=None,
+        engine=_excel_engine(),
+        usecols=lambda c: not str(c).startswith("Unnamed:"),
+        dtype=CUSTOMER_DTYPES,
+    )
+    return pd.concat(sheets.values(), ignore_index=True)
 
 
 def _load_raw_customers_from_files() -> pd.DataFrame:
-    """Carga TODAS las hojas de customer-details.xlsx y las concatena."""
-    xls = pd.ExcelFile(CUSTOMER_PATH)
-    frames = []
+    """
+    Carga TODAS las hojas de customer-details.xlsx y las concatena.
+    El resultado se guarda en CACHE_DIR (Feather) con una clave basada en
+    tamaño + mtime del Excel: mientras no cambie, no se vuelve a parsear.
+    """
+    cache_path = CACHE_DIR / f"customers-{_file_key(CUSTOMER_PATH)}.feather"
+    use_cache = importlib.util.find_spec("pyarrow") is not None
 
-    for sheet in xls.sheet_names:
-        tmp = pd.read_excel(CUSTOMER_PATH, sheet_name=sheet)
-        frames.append(tmp)
+    if use_cache and cache_path.exists():
+        return pd.read_feather(cache_path)
 
-    df = pd.concat(frames, ignore_index=True)
+    t0 = time.perf_counter()
+    df = _read_customer_workbook(CUSTOMER_PATH)
+    print(f"[INFO] customer-details.xlsx leído en {time.perf_counter() - t0:.2f} s "
+          f"(motor: {_excel_engine()})")
 
-    if "Unnamed: 0" in df.columns:
-        df = df.drop(columns=["Unnamed: 0"])
+    if use_cache:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for old in CACHE_DIR.glob("customers-*.feather"):
+            old.unlink(missing_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_feather(tmp_path)
+        os.replace(tmp_path, cache_path)
 
     return df
 
@@ -55,26 +201,47 @@ def _load_raw_customers_from_files() -> pd.DataFrame:
 # 2. Carga de datos desde POSTGRES
 # -------------------------------------------------------------------
 def _get_pg_engine():
-    url = (
-        f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}"
-        f"@{PG_HOST}:{PG_PORT}/{PG_DB_NAME}"
+    """
+    Engine único por proceso: el pool de conexiones de SQLAlchemy se
+    reutiliza entre llamadas en lugar de crear un engine nuevo cada vez.
+    """
+    global _PG_ENGINE
+    with _PG_ENGINE_LOCK:
+        if _PG_ENGINE is None:
+            url = (
+                f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}"
+                f"@{PG_HOST}:{PG_PORT}/{PG_DB_NAME}"
+            )
+            _PG_ENGINE = create_engine(url, pool_size=5, max_overflow=5, pool_pre_ping=True)
+    return _PG_ENGINE
+
+
+def _merged_query() -> str:
+    """
+    JOIN bank_additional ⋈ customer_details resuelto en PostgreSQL,
+    seleccionando solo las columnas que usa el dashboard.
+    """
+    cols = [f'b."{c}"' for c in BANK_COLUMNS] + [f'c."{c}"' for c in CUSTOMER_COLUMNS]
+    return (
+        f"SELECT {', '.join(cols)} "
+        f"FROM bank_additional AS b "
+        f'JOIN customer_details AS c ON b."id_" = c."ID"'
     )
-    return create_engine(url)
 
 
-def _load_raw_from_postgres() -> tuple[pd.DataFrame, pd.DataFrame]:
+def _stream_merged_from_postgres(chunksize: int = PG_CHUNKSIZE):
     """
-    Carga las tablas originales desde PostgreSQL:
-    - bank_additional
-    - customer_details
+    Devuelve el resultado del JOIN por bloques de `chunksize` filas usando
+    un cursor del lado del servidor (stream_results), de modo que nunca se
+    tienen las dos tablas completas en memoria.
     """
-    print("[INFO] Cargando datos desde PostgreSQL...")
+    print("[INFO] Cargando datos desde PostgreSQL (JOIN en servidor, por bloques)...")
     engine = _get_pg_engine()
 
-    df_bank = pd.read_sql_table("bank_additional", con=engine)
-    df_cust = pd.read_sql_table("customer_details", con=engine)
-
-    return df_bank, df_cust
+    with engine.connect().execution_options(
+        stream_results=True, max_row_buffer=chunksize
+    ) as conn:
+        yield from pd.read_sql_query(text(_merged_query()), conn, chunksize=chunksize)
 
 
 # -------------------------------------------------------------------
@@ -102,138 +269,423 @@ def _merge_bank_and_customers(df_bank: pd.DataFrame,
 # -------------------------------------------------------------------
 # 4. Limpieza y transformación común
 # -------------------------------------------------------------------
-def _clean_data(raw_df: pd.DataFrame) -> pd.DataFrame:
-    df = raw_df.copy()
+def _as_category(s: pd.Series) -> pd.Series:
+    return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
 
-    # Eliminar columnas técnicas
-    cols_to_drop = [c for c in df.columns if c.startswith("Unnamed:")]
-    cols_to_drop += ["ID", "id_"]
-    df = df.drop(columns=[c for c in cols_to_drop if c in df.columns],
-                 errors="ignore")
 
-    # Conversión coma→punto
-    num_comma_cols = ["cons.price.idx", "cons.conf.idx", "euribor3m", "nr.employed"]
-    for col in num_comma_cols:
-        if col in df.columns:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.replace(",", ".", regex=False)
-                .replace(
-                    {
-                        "nan": np.nan,
-                        "None": np.nan,
-                        "none": np.nan,
-                        "": np.nan,
-                    }
-                )
-            )
-            # Conversión robusta a float
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+def _parse_comma_decimal(s: pd.Series) -> pd.Series:
+    """
+    "93,994" → 93.994. Solo se parsean los valores DISTINTOS (categorías) y
+    el resultado se expande con los códigos: no se crea ninguna columna
+    intermedia de strings del tamaño del dataset.
+    """
+    if pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype("float64")
+    cat = _as_category(s)
+    values = pd.to_numeric(
+        cat.cat.categories.astype(str).str.replace(",", ".", regex=False),
+        errors="coerce",
+    ).to_numpy(dtype="float64")
+    values = np.append(values, np.nan)           # código -1 (nulo) → NaN
+    return pd.Series(values[cat.cat.codes.to_numpy()], index=s.index, name=s.name)
 
 
-    # Fechas
-    if "Dt_Customer" in df.columns:
-        df["Dt_Customer"] = pd.to_datetime(df["Dt_Customer"], errors="coerce")
+def _recode_categories(s: pd.Series, func, missing: str) -> pd.Series:
+    """
+    Aplica `func` a cada categoría distinta (no a cada fila) y reconstruye
+    los códigos; los nulos pasan a `missing`. Devuelve una columna categórica.
+    """
+    cat = _as_category(s)
+    codes = cat.cat.codes.to_numpy()
+    labels = [func(c) for c in cat.cat.categories]
+    uniques = set(labels) | ({missing} if (codes < 0).any() else set())
+    uniques = sorted(uniques)                    # mismo orden que astype("category")
+    position = {label: i for i, label in enumerate(uniques)}
+    lookup = np.array(
+        [position[label] for label in labels] + [position.get(missing, 0)],
+        dtype=np.int16,
+    )
+    codes = lookup[codes]                        # código -1 (nulo) → missing
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=uniques),
+        index=s.index,
+        name=s.name,
+    )
 
-    if "date" in df.columns:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-            df["date"] = pd.to_datetime(df["date"], errors="coerce", dayfirst=True)
 
-    # Binarias financieras
-    bin_cols = ["default", "housing", "loan"]
-    for col in bin_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str).replace({"0.0": "no", "1.0": "yes"})
-            df[col] = df[col].replace({"nan": np.nan}).fillna("unknown")
+def _parse_binary_flag(s: pd.Series) -> pd.Series:
+    """0/1 (o "0.0"/"1.0") → "no"/"yes"; nulos → "unknown"."""
+    mapping = {"0.0": "no", "1.0": "yes", "0": "no", "1": "yes"}
+    return _recode_categories(s, lambda c: mapping.get(str(c), str(c)), "unknown")
 
-    # Edad
-    if "age" in df.columns:
-        df["age"] = pd.to_numeric(df["age"], errors="coerce")
-        df["age"] = df["age"].fillna(df["age"].median())
 
+def _parse_category(s: pd.Series) -> pd.Series:
+    """Texto categórico; nulos → "unknown"."""
+    return _recode_categories(s, str, "unknown")
 
-    # Categóricas
-    for col in ["job", "marital", "education"]:
-        if col in df.columns:
-            df[col] = df[col].fillna("unknown")
 
-    # Macroeconómicas
-    for col in ["cons.price.idx", "euribor3m"]:
+def _parse_target(s: pd.Series) -> pd.Series:
+    """Variable objetivo en minúsculas ("yes"/"no")."""
+    return _recode_categories(s, lambda c: str(c).lower(), "nan")
+
+
+def _parse_numeric(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _parse_datetime(s: pd.Series, dayfirst: bool = False) -> pd.Series:
+    """Fechas: se parsea cada valor distinto una sola vez."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    cat = _as_category(s)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(
+            cat.cat.categories.astype(str), errors="coerce", dayfirst=dayfirst
+        )
+    codes = cat.cat.codes.to_numpy()
+    values = parsed.take(np.where(codes < 0, 0, codes)).to_numpy()
+    values[codes < 0] = np.datetime64("NaT")
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+# Especificación declarativa: columna → parser (se aplica en una sola pasada)
+CLEANING_SPEC = {
+    "cons.price.idx": _parse_comma_decimal,
+    "cons.conf.idx": _parse_comma_decimal,
+    "euribor3m": _parse_comma_decimal,
+    "nr.employed": _parse_comma_decimal,
+    "Dt_Customer": _parse_datetime,
+    "date": lambda s: _parse_datetime(s, dayfirst=True),
+    "default": _parse_binary_flag,
+    "housing": _parse_binary_flag,
+    "loan": _parse_binary_flag,
+    "age": _parse_numeric,
+    "job": _parse_category,
+    "marital": _parse_category,
+    "education": _parse_category,
+    "y": _parse_target,
+}
+
+# Columnas de texto del CSV que se leen directamente como categóricas
+BANK_READ_DTYPES = {
+    col: "category"
+    for col in ["job", "marital", "education", "contact", "poutcome", "y", "date",
+                "cons.price.idx", "cons.conf.idx", "euribor3m", "nr.employed"]
+}
+
+
+def _apply_cleaning_spec(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplica CLEANING_SPEC a las columnas presentes (bank, clientes o merged)."""
+    for col, parser in CLEANING_SPEC.items():
         if col in df.columns:
-            df[col] = df[col].fillna(df[col].median())
+            df[col] = parser(df[col])
+    return df
+
 
-    # Variable objetivo binaria
+def _add_target_flag(df: pd.DataFrame) -> pd.DataFrame:
+    """Variable objetivo binaria y_bin (a partir de y ya limpia)."""
     if "y" in df.columns:
-        df["y"] = df["y"].astype(str).str.lower()
-        df["y_bin"] = df["y"].map({"no": 0, "yes": 1}).astype(int)
+        df["y_bin"] = (df["y"] == "yes").to_numpy()
+    return df
+
+
+def _clean_data(raw_df: pd.DataFrame, fill_missing: bool = True) -> pd.DataFrame:
+    """
+    Limpieza común de un merged sin limpiar (CSV antiguo o bloques de PostgreSQL).
+    Con fill_missing=False no se imputan las medianas: así se puede limpiar
+    por bloques y rellenar al final con las medianas del dataset completo
+    (ver _fill_missing_with_medians).
+    """
+    # Eliminar columnas técnicas (drop devuelve un frame nuevo: raw_df no se toca)
+    cols_to_drop = [c for c in raw_df.columns if c.startswith("Unnamed:")]
+    cols_to_drop += ["ID", "id_"]
+    df = raw_df.drop(columns=[c for c in cols_to_drop if c in raw_df.columns])
+
+    df = _add_target_flag(_apply_cleaning_spec(df))
+
+    if fill_missing:
+        df = _fill_missing_with_medians(df)
+        df = _apply_dtype_schema(df, report=True)
+
+    return df
 
+
+def _apply_dtype_schema(df: pd.DataFrame, report: bool = False) -> pd.DataFrame:
+    """
+    Aplica DTYPE_SCHEMA: categóricas, enteros reducidos, float32 y bool.
+    Los enteros con nulos se quedan como float (solo se reduce el ancho).
+    """
+    before = df.memory_usage(deep=True).sum()
+
+    for col, kind in DTYPE_SCHEMA.items():
+        if col not in df.columns or _has_schema_dtype(df[col], kind):
+            continue    # ya tiene el tipo: no se copia (p. ej. snapshot compartido)
+        if kind == "category":
+            df[col] = df[col].astype("category")
+        elif kind == "integer":
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+            if df[col].dtype.kind == "f":
+                df[col] = df[col].astype("float32")
+        elif kind == "float32":
+            df[col] = df[col].astype("float32")
+        elif kind == "bool":
+            df[col] = df[col].astype(bool)
+
+    if report:
+        after = df.memory_usage(deep=True).sum()
+        print(f"[INFO] Memoria del dataset: {before / 1e6:.1f} MB → {after / 1e6:.1f} MB")
+    return df
+
+
+def _has_schema_dtype(s: pd.Series, kind: str) -> bool:
+    if kind == "category":
+        return isinstance(s.dtype, pd.CategoricalDtype)
+    if kind == "integer":
+        # Entero ya reducido al mínimo ancho (p. ej. el del snapshot)
+        return s.dtype.kind in "iu" and pd.to_numeric(s, downcast="integer").dtype == s.dtype
+    if kind == "float32":
+        return s.dtype == np.float32
+    return s.dtype == bool
+
+
+# Columnas cuyos nulos se imputan con la mediana: edad y macroeconómicas
+MEDIAN_COLUMNS = ["age", "cons.price.idx", "euribor3m"]
+
+
+def _fill_missing_with_medians(df: pd.DataFrame, medians: dict | None = None) -> pd.DataFrame:
+    """
+    Imputa con la mediana la edad y las macroeconómicas (sobre el dataset completo).
+    `medians` permite pasar medianas ya calculadas (p. ej. en el modo por bloques).
+    """
+    for col in MEDIAN_COLUMNS:
+        if col in df.columns:
+            median = df[col].median() if medians is None else medians[col]
+            df[col] = df[col].fillna(median)
     return df
 
 
 # -------------------------------------------------------------------
-# 5. Construcción de merged_dataset desde FICHEROS
+# 5. Snapshot columnar tipado (arranque en caliente)
+# -------------------------------------------------------------------
+# Con EDA_SHARED_DATASET=1 el DataFrame se monta directamente sobre el
+# snapshot mapeado en memoria (sin copiar las columnas): con varios
+# procesos del servidor (gunicorn -w N app:server) todos comparten las
+# mismas páginas del fichero en lugar de tener cada uno su copia.
+SHARED_DATASET = os.environ.get("EDA_SHARED_DATASET", "0") == "1"
+
+def _write_snapshot(df: pd.DataFrame) -> None:
+    """
+    Guarda el DataFrame ya limpio en formato Feather (Arrow IPC) sin comprimir.
+    Conserva tipos numéricos, categóricos y fechas, por lo que al leerlo
+    no hay que volver a pasar por _clean_data.
+    """
+    if importlib.util.find_spec("pyarrow") is None:   # dependencia opcional
+        print("[AVISO] pyarrow no está instalado: no se genera el snapshot columnar.")
+        return
+
+    # Escritura atómica: se escribe en un temporal y se renombra
+    # En un solo bloque (record batch): cada columna queda contigua en el
+    # fichero y se puede usar sin copiar (ver EDA_SHARED_DATASET)
+    tmp_path = SNAPSHOT_PATH.with_suffix(f".feather.{os.getpid()}.tmp")
+    df.reset_index(drop=True).to_feather(
+        tmp_path, compression="uncompressed", chunksize=max(len(df), 1),
+    )
+    os.replace(tmp_path, SNAPSHOT_PATH)
+    print(f"[INFO] Snapshot columnar generado en: {SNAPSHOT_PATH}")
+
+
+def _write_merged_csv(df: pd.DataFrame) -> None:
+    tmp_path = MERGED_PATH.with_suffix(f".csv.{os.getpid()}.tmp")
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, MERGED_PATH)
+
+
+def _read_snapshot(shared: bool = SHARED_DATASET) -> pd.DataFrame:
+    """
+    Lee el snapshot Feather mapeándolo en memoria (sin limpieza adicional).
+    Con shared=True las columnas numéricas, de fecha y los códigos de las
+    categóricas apuntan al propio mapeo (solo lectura, sin copia): la memoria
+    la pone la caché de páginas del sistema, compartida entre procesos.
+    """
+    import pyarrow.feather as feather
+
+    table = feather.read_table(SNAPSHOT_PATH, memory_map=True)
+    if shared:
+        return table.to_pandas(split_blocks=True)
+    return table.to_pandas()
+
+
+def _snapshot_available() -> bool:
+    return SNAPSHOT_PATH.exists() and importlib.util.find_spec("pyarrow") is not None
+
+
+# -------------------------------------------------------------------
+# 6. Construcción de merged_dataset desde FICHEROS
 # -------------------------------------------------------------------
 def _build_merged_from_files() -> pd.DataFrame:
     print("[INFO] Generando merged_dataset a partir de CSV + Excel...")
-    df_bank = _load_raw_bank_from_files()
-    df_cust = _load_raw_customers_from_files()
-    merged_raw = _merge_bank_and_customers(df_bank, df_cust)
-    clean_df = _clean_data(merged_raw)
+    raw_bank = _load_raw_bank_from_files()
+    raw_cust = _load_raw_customers_from_files()
+    # Hash de cada fila de origen (antes de limpiar) para builds incrementales
+    row_hashes = _source_row_hashes(raw_bank, raw_cust)
+
+    # Cada fuente se limpia ANTES de unir: solo se tocan sus propias columnas
+    df_bank = _apply_cleaning_spec(raw_bank)
+    df_cust = _apply_cleaning_spec(raw_cust)
+    merged = _add_target_flag(_merge_bank_and_customers(df_bank, df_cust))
+    row_index = _row_index(merged, row_hashes)
+    clean_df = _fill_missing_with_medians(merged.drop(columns=["id_"]))
+    clean_df = _apply_dtype_schema(clean_df, report=True)
 
-    clean_df.to_csv(MERGED_PATH, index=False)
+    # Primero el snapshot y después el CSV (ambos con escritura atómica):
+    # así otro proceso nunca ve un fichero a medio escribir
+    _write_snapshot(clean_df)
+    _write_merged_csv(clean_df)
+    _write_build_manifest(clean_df, row_index)
     print(f"[INFO] merged_dataset.csv generado en: {MERGED_PATH}")
     return clean_df
 
 
 # -------------------------------------------------------------------
-# 6. Construcción de merged_dataset desde POSTGRES
+# 7. Construcción de merged_dataset desde POSTGRES
 # -------------------------------------------------------------------
 def _build_merged_from_postgres() -> pd.DataFrame:
     print("[INFO] Generando merged_dataset a partir de la BD PostgreSQL...")
-    df_bank, df_cust = _load_raw_from_postgres()
-    merged_raw = _merge_bank_and_customers(df_bank, df_cust)
-    clean_df = _clean_data(merged_raw)
+    # Cada bloque del JOIN se limpia nada más llegar; las medianas se
+    # imputan al final sobre el dataset completo
+    chunks = [
+        _clean_data(chunk, fill_missing=False)
+        for chunk in _stream_merged_from_postgres()
+    ]
+    clean_df = _fill_missing_with_medians(pd.concat(chunks, ignore_index=True))
+    clean_df = _apply_dtype_schema(clean_df, report=True)
 
-    clean_df.to_csv(MERGED_PATH, index=False)
+    # Primero el snapshot y después el CSV (ambos con escritura atómica):
+    # así otro proceso nunca ve un fichero a medio escribir
+    _write_snapshot(clean_df)
+    _write_merged_csv(clean_df)
+    BUILD_MANIFEST_PATH.unlink(missing_ok=True)   # no hay ficheros de origen que vigilar
     print(f"[INFO] merged_dataset.csv generado desde PostgreSQL en: {MERGED_PATH}")
     return clean_df
 
 
 # -------------------------------------------------------------------
-# 7. Punto de entrada: load_data()
+# 8. Versión (huella) del dataset cacheado
 # -------------------------------------------------------------------
-def load_data() -> pd.DataFrame:
+def _dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Huella estable del contenido del DataFrame (columnas, tipos y valores)."""
+    h = hashlib.sha256()
+    h.update(",".join(f"{c}:{t}" for c, t in df.dtypes.items()).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def _set_data_cache(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Lógica solicitada:
+    Publica `df` como el dataset en memoria: crea un handle nuevo (huella,
+    datos y caché de derivadas vacía) y lo sustituye en una sola asignación.
+    """
+    global _DATASET
+    _DATASET = {
+        "version": _dataset_fingerprint(df),
+        "df": df,
+        "derived": {},
+        "lock": threading.Lock(),
+    }
+    return df
 
-    1) Si _DATA_CACHE ya está cargado → devolverlo directamente.
-    2) Si merged_dataset.csv EXISTE:
-         - Leerlo, limpiar ligeramente y devolverlo.
-    3) Si merged_dataset.csv NO existe:
-         - Preguntar al usuario en consola:
-             [1] Generar desde CSV + Excel
-             [2] Generar desde BD PostgreSQL
-         - Ejecutar la opción elegida
-         - Guardar merged_dataset.csv
-         - Devolver el DataFrame limpio.
+
+def get_dataset() -> dict:
+    """
+    Handle del dataset en memoria (cargándolo si hace falta). Una petición
+    debe leer versión, datos y derivadas de un mismo handle para no mezclar
+    versiones si hay una recarga a mitad.
     """
-    global _DATA_CACHE
+    dataset = _DATASET
+    if dataset is None:
+        load_data()
+        dataset = _DATASET
+    return dataset
 
-    # 1) Cache en memoria
-    if _DATA_CACHE is not None:
-        return _DATA_CACHE
 
-    # 2) merged_dataset.csv existe → usarlo
+def get_data_version() -> str:
+    """
+    Devuelve la huella del dataset en memoria (cargándolo si hace falta).
+    Las caches de la vista (layout, figuras...) se indexan por este valor,
+    de modo que solo se invalidan cuando cambian los datos fusionados.
+    """
+    return get_dataset()["version"]
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """Huella de `df`: la del handle actual si es su DataFrame, si no se calcula."""
+    dataset = _DATASET
+    if dataset is not None and dataset["df"] is df:
+        return dataset["version"]
+    return _dataset_fingerprint(df)
+
+
+# -------------------------------------------------------------------
+# 9. Selección del origen y lock de construcción entre procesos
+# -------------------------------------------------------------------
+@contextmanager
+def _build_lock():
+    """
+    Lock exclusivo entre procesos (fichero + flock/msvcrt).
+    Con varios workers (gunicorn/uwsgi) solo uno genera el merged; el resto
+    espera y después reutiliza el snapshot que ha dejado el primero.
+    El sistema operativo libera el lock si el proceso muere.
+    """
+    BUILD_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(BUILD_LOCK_PATH, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue    # LK_LOCK reintenta durante ~10 s y luego falla
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _load_existing_merged():
+    """Snapshot columnar o merged_dataset.csv si ya existen; None en otro caso."""
+    # Snapshot columnar → carga directa, sin re-limpieza
+    if _snapshot_available():
+        t0 = time.perf_counter()
+        # Un snapshot antiguo puede no tener el esquema de tipos actual
+        df = _apply_dtype_schema(_read_snapshot())
+        print(f"[INFO] Snapshot cargado en {time.perf_counter() - t0:.2f} s: {SNAPSHOT_PATH}")
+        return df
+
+    # merged_dataset.csv existe → usarlo (y dejar el snapshot para la próxima vez)
     if MERGED_PATH.exists():
         print(f"[INFO] Usando merged_dataset existente: {MERGED_PATH}")
+        t0 = time.perf_counter()
         raw_merged = pd.read_csv(MERGED_PATH)
         df = _clean_data(raw_merged)
-        _DATA_CACHE = df
+        print(f"[INFO] CSV leído y limpiado en {time.perf_counter() - t0:.2f} s")
+        _write_snapshot(df)
         return df
 
-    # 3) merged_dataset.csv NO existe → preguntar al usuario
+    return None
+
+
+def _ask_source_interactively() -> str:
     print("\n[AVISO] El archivo 'merged_dataset.csv' no existe en la carpeta /data.")
     print("¿Cómo desea generarlo?")
     print("  [1] A partir de los ficheros originales (bank-additional.csv + customer-details.xlsx)")
@@ -241,11 +693,1239 @@ def load_data() -> pd.DataFrame:
     opcion = None
     while opcion not in ("1", "2"):
         opcion = input("Seleccione una opción (1/2): ").strip()
+    return "files" if opcion == "1" else "postgres"
 
-    if opcion == "1":
-        df = _build_merged_from_files()
-    else:
-        df = _build_merged_from_postgres()
 
-    _DATA_CACHE = df
+def _resolve_build_source() -> str:
+    """
+    Decide desde dónde generar el merged cuando no existe.
+    Solo se pregunta por consola en modo "auto" y con una terminal interactiva;
+    un worker sin stdin (gunicorn, contenedor...) nunca se queda bloqueado.
+    """
+    if DATA_SOURCE in ("files", "postgres", "chunked"):
+        return DATA_SOURCE
+    if sys.stdin is not None and sys.stdin.isatty():
+        return _ask_source_interactively()
+    print("[AVISO] Sin terminal interactiva: se genera el merged desde los ficheros originales.")
+    return "files"
+
+
+# -------------------------------------------------------------------
+# 10. Punto de entrada: load_data()
+# -------------------------------------------------------------------
+def load_data() -> pd.DataFrame:
+    """
+    Lógica solicitada:
+
+    1) Si el dataset ya está en memoria → devolverlo directamente.
+    2) Si existe el snapshot merged_dataset.feather:
+         - Leerlo tal cual (ya está limpio y tipado) y devolverlo.
+    3) Si solo existe merged_dataset.csv:
+         - Leerlo, limpiarlo, generar el snapshot y devolverlo.
+       En 2) y 3), si el merged se generó desde ficheros y estos han cambiado,
+       se re-fusionan solo las filas nuevas o modificadas (sección 15).
+    4) Si no existe ninguno, según EDA_DATA_SOURCE:
+         - "snapshot" → error (no se genera nada)
+         - "files"    → generar desde CSV + Excel
+         - "postgres" → generar desde BD PostgreSQL
+         - "chunked"  → generar desde CSV + Excel por bloques (fuera de memoria)
+         - "auto"     → preguntar en consola si hay terminal; si no, "files"
+       La generación se hace bajo un lock de fichero: si varios procesos
+       arrancan a la vez, solo uno construye y los demás leen el resultado.
+    """
+    # 1) Cache en memoria
+    dataset = _DATASET
+    if dataset is not None:
+        return dataset["df"]
+
+    return _set_data_cache(_load_or_build())
+
+
+def _load_or_build() -> pd.DataFrame:
+    """Pasos 2) a 4) de load_data(): merged existente o generación."""
+    if DATA_SOURCE not in DATA_SOURCES:
+        raise ValueError(
+            f"EDA_DATA_SOURCE='{DATA_SOURCE}' no válido. Opciones: {', '.join(DATA_SOURCES)}"
+        )
+
+    # 2) y 3) Datos ya fusionados (al día con las fuentes si han cambiado)
+    df = _load_existing_merged()
+    if df is not None:
+        return _sync_with_sources(df)
+
+    if DATA_SOURCE == "snapshot":
+        raise FileNotFoundError(
+            f"EDA_DATA_SOURCE=snapshot pero no existe {SNAPSHOT_PATH} ni {MERGED_PATH}."
+        )
+
+    # 4) Generación (una sola vez entre todos los procesos)
+    with _build_lock():
+        # Otro proceso puede haberlo generado mientras esperábamos el lock
+        df = _load_existing_merged()
+        if df is None:
+            source = _resolve_build_source()
+            if source == "files":
+                df = _build_merged_from_files()
+            elif source == "chunked":
+                df = _build_merged_chunked()
+            else:
+                df = _build_merged_from_postgres()
+
     return df
+
+
+# -------------------------------------------------------------------
+# 11. Estructuras derivadas (se construyen una vez por versión)
+# -------------------------------------------------------------------
+def get_derived(name: str, builder, df: pd.DataFrame | None = None):
+    """
+    Devuelve la estructura derivada `name` del dataset en memoria,
+    construyéndola con builder(df) la primera vez. Se guarda en el handle
+    del dataset, así que se descarta junto con él al cambiar los datos.
+    Con `df` se pide la derivada de ese DataFrame concreto: si ya no es el
+    dataset actual (hubo una recarga a mitad de petición) se calcula sin
+    cachear, para que la petición termine con datos coherentes.
+    """
+    dataset = get_dataset()
+    if df is not None and df is not dataset["df"]:
+        return builder(df)
+    with dataset["lock"]:
+        if name not in dataset["derived"]:
+            dataset["derived"][name] = builder(dataset["df"])
+        return dataset["derived"][name]
+
+
+def build_age_index(df: pd.DataFrame) -> dict:
+    """
+    Índice ordenado por edad: edades ordenadas + suma acumulada de y_bin en
+    ese mismo orden. Permite contar clientes y conversiones de cualquier
+    rango de edad con búsquedas binarias, sin filtrar ni copiar filas.
+    """
+    age = df["age"].to_numpy(dtype="float64")
+    y = df["y_bin"].to_numpy(dtype=np.int64)
+    valid = ~np.isnan(age)
+    order = np.argsort(age[valid], kind="stable")
+    return {
+        "ages": age[valid][order],
+        "cum_y": np.concatenate([[0], np.cumsum(y[valid][order])]),
+    }
+
+
+def age_index_bin_stats(index: dict, edges, age_min=None, age_max=None):
+    """
+    Clientes y conversiones por tramo de edad, con la misma semántica que
+    pd.cut(..., include_lowest=True) sobre las filas con age_min <= age <= age_max.
+    Coste O(tramos · log n). Devuelve (counts, y_sums) como arrays.
+    """
+    ages, cum_y = index["ages"], index["cum_y"]
+    edges = np.asarray(edges, dtype="float64")
+
+    # Tramos (e_i, e_i+1]; el primero incluye su borde izquierdo
+    lo = np.searchsorted(ages, edges[:-1], side="right")
+    lo[0] = np.searchsorted(ages, edges[0], side="left")
+    hi = np.searchsorted(ages, edges[1:], side="right")
+
+    if age_min is not None:
+        lo = np.maximum(lo, np.searchsorted(ages, age_min, side="left"))
+    if age_max is not None:
+        hi = np.minimum(hi, np.searchsorted(ages, age_max, side="right"))
+    hi = np.maximum(hi, lo)
+
+    return hi - lo, cum_y[hi] - cum_y[lo]
+
+
+
+def build_geo_coords(df: pd.DataFrame) -> dict:
+    """
+    Coordenadas válidas (sin nulos) como arrays float64 contiguos, para
+    rasterizar el mapa en cada zoom sin volver a filtrar el DataFrame.
+    """
+    lon = df["longitude"].to_numpy(dtype="float64")
+    lat = df["latitude"].to_numpy(dtype="float64")
+    valid = ~(np.isnan(lon) | np.isnan(lat))
+    return {"lon": lon[valid], "lat": lat[valid]}
+
+# -------------------------------------------------------------------
+# 12. Cubo de agregados (conteos y conversiones precalculados)
+# -------------------------------------------------------------------
+# Dimensiones categóricas del cubo: una celda por combinación observada
+CUBE_DIMENSIONS = ["job", "marital", "education", "default", "housing", "loan", "y"]
+
+# Dimensiones numéricas del cubo: se guardan por tramos (marginales)
+CUBE_NUMERIC_COLUMNS = ["age", "Income", "NumWebVisitsMonth", "previous"]
+
+# Tramos de edad de los gráficos de conversión (décadas aproximadas)
+AGE_BINS = [18, 30, 40, 50, 60, 80]
+
+
+def conversion_bins(df: pd.DataFrame, col: str) -> list:
+    """Bordes de los tramos usados en los gráficos de conversión de `col`."""
+    if col == "age":
+        return AGE_BINS
+    if col == "Income":
+        # Cuartiles; sin bordes duplicados si hay muchos valores iguales
+        q = df["Income"].dropna().quantile([0, 0.25, 0.5, 0.75, 1]).values
+        return sorted(set(q))
+    # Conteos enteros (visitas web, contactos previos): 0-1, 1-2, ...
+    return list(range(0, int(df[col].max()) + 2))
+
+
+def _numeric_marginal(df: pd.DataFrame, col: str) -> dict:
+    aux = df[[col, "y_bin"]].dropna()
+    bins = conversion_bins(df, col)
+    table = (
+        aux.groupby(pd.cut(aux[col], bins=bins, include_lowest=True), observed=False)["y_bin"]
+        .agg(count="size", y_sum="sum")
+        .rename_axis("bin")
+        .reset_index()
+    )
+    return {"bins": bins, "n_valid": len(aux), "table": table}
+
+
+def build_aggregate_cube(df: pd.DataFrame) -> dict:
+    """
+    Cubo de agregados del dataset:
+      - "cells": nº de clientes (count) y de conversiones (y_sum) por cada
+        combinación observada de CUBE_DIMENSIONS (los nulos son una celda más).
+      - "marginals": count / y_sum por categoría de cada dimensión (ya
+        agregados para las vistas sin filtro).
+      - "numeric": por cada columna de CUBE_NUMERIC_COLUMNS, count / y_sum por
+        tramo (conversion_bins) sobre las filas con valor.
+    Los gráficos de distribución y conversión se sirven de aquí sin recorrer
+    las filas. Las vistas filtradas no construyen otro cubo: usan
+    cube_for_filters (celdas de filter_cube + solo los marginales numéricos
+    que necesitan, calculados sobre el subconjunto).
+    """
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    cells = (
+        df.groupby(dims, observed=True, dropna=False)["y_bin"]
+        .agg(count="size", y_sum="sum")
+        .reset_index()
+    )
+    numeric = {
+        col: _numeric_marginal(df, col)
+        for col in CUBE_NUMERIC_COLUMNS
+        if col in df.columns
+    }
+    marginals = {
+        col: cells.groupby(col, observed=True)[["count", "y_sum"]].sum()
+        for col in dims
+    }
+    return {"dims": dims, "cells": cells, "marginals": marginals, "numeric": numeric}
+
+
+def filter_cube(cube: dict, filters: dict) -> dict:
+    """
+    Subcubo con las celdas cuyas dimensiones están en los valores pedidos,
+    p.ej. {"housing": ["yes"], "job": ["admin.", "technician"]}.
+    Los marginales se recalculan desde las celdas al consultarlos; los
+    numéricos no se pueden filtrar por celda, así que el subcubo no los
+    incluye (los gráficos recurren entonces al DataFrame).
+    """
+    cells = cube["cells"]
+    mask = np.ones(len(cells), dtype=bool)
+    for col, values in filters.items():
+        if col not in cube["dims"]:
+            raise ValueError(f"'{col}' no es una dimensión del cubo: {cube['dims']}")
+        if values:
+            mask &= cells[col].isin(values).to_numpy()
+    return {"dims": cube["dims"], "cells": cells[mask], "marginals": {}, "numeric": {}}
+
+
+def cube_for_filters(cube: dict, sub: pd.DataFrame, filters: dict | None, numeric=()) -> dict:
+    """
+    Cubo de una vista filtrada a partir del cubo del dataset completo:
+      - filtros solo por dimensiones del cubo → celdas con filter_cube;
+      - filtros por otras columnas (edad, fecha) → sin celdas: las celdas no
+        guardan esas columnas (los recuentos salen del índice de segmentos).
+    Los marginales numéricos se calculan solo para las columnas `numeric`,
+    sobre `sub` (las filas que cumplen los filtros).
+    """
+    active = {col: values for col, values in (filters or {}).items() if values}
+    if not active:
+        return cube
+    if set(active) <= set(cube["dims"]):
+        view = filter_cube(cube, active)
+    else:
+        view = {"dims": [], "cells": None, "marginals": {}, "numeric": {}}
+    view["numeric"] = {
+        col: _numeric_marginal(sub, col)
+        for col in numeric
+        if col in sub.columns
+    }
+    return view
+
+
+def cube_counts(cube: dict, col: str, value: str = "count") -> pd.Series:
+    """Suma de `value` (count / y_sum) por categoría de `col`, sin nulos."""
+    if col in cube["marginals"]:
+        return cube["marginals"][col][value]
+    return cube["cells"].groupby(col, observed=True)[value].sum()
+
+
+# -------------------------------------------------------------------
+# 13. Modelo logístico edad → contratación (cacheado e incremental)
+# -------------------------------------------------------------------
+# Misma regularización que LogisticRegression() por defecto: L2 con C=1
+# sobre la pendiente, intercepto sin penalizar
+LOGISTIC_C = 1.0
+
+
+def age_sufficient_stats(df: pd.DataFrame) -> dict:
+    """
+    Estadísticos suficientes del modelo logístico de una variable: para cada
+    edad distinta, nº de clientes (n) y de contrataciones (y). El ajuste solo
+    depende de ellos, así que nuevas filas se incorporan sumando conteos.
+    """
+    aux = df[["age", "y_bin"]].dropna()
+    grouped = aux.groupby(aux["age"].astype("float64"))["y_bin"].agg(["size", "sum"])
+    return {
+        "age": grouped.index.to_numpy(dtype="float64"),
+        "n": grouped["size"].to_numpy(dtype="float64"),
+        "y": grouped["sum"].to_numpy(dtype="float64"),
+    }
+
+
+def _merge_age_stats(a: dict, b: dict, sign: float = 1.0) -> dict:
+    """Suma (sign=1) o resta (sign=-1) los conteos de b a los de a; sin edades vacías."""
+    ages = np.concatenate([a["age"], b["age"]])
+    uniq, inverse = np.unique(ages, return_inverse=True)
+    n = np.bincount(inverse, np.concatenate([a["n"], sign * b["n"]]), len(uniq))
+    y = np.bincount(inverse, np.concatenate([a["y"], sign * b["y"]]), len(uniq))
+    keep = n > 0
+    return {"age": uniq[keep], "n": n[keep], "y": y[keep]}
+
+
+def _fit_logistic_newton(stats: dict, start=(0.0, 0.0), C: float = LOGISTIC_C,
+                         tol: float = 1e-10, max_iter: int = 100):
+    """
+    Máxima verosimilitud penalizada (L2 sobre la pendiente) por Newton sobre
+    los estadísticos suficientes: cada iteración cuesta O(nº de edades
+    distintas). `start` permite arrancar desde coeficientes previos.
+    """
+    x, n, y = stats["age"], stats["n"], stats["y"]
+    X = np.column_stack([np.ones_like(x), x])
+    beta = np.asarray(start, dtype="float64")
+    penalty = np.diag([0.0, 1.0 / C])
+
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-(X @ beta)))
+        grad = X.T @ (y - n * p) - penalty @ beta
+        hess = (X * (n * p * (1 - p))[:, None]).T @ X + penalty
+        step = np.linalg.solve(hess, grad)
+        beta = beta + step
+        if np.max(np.abs(step)) < tol:
+            break
+    return float(beta[0]), float(beta[1])
+
+
+def _logistic_model_from_stats(stats: dict, start=(0.0, 0.0)) -> dict:
+    intercept, coef = _fit_logistic_newton(stats, start)
+    return {"intercept": intercept, "coef": coef, "stats": stats}
+
+
+def fit_logistic_age_model(df: pd.DataFrame) -> dict:
+    """Ajuste completo del modelo logístico edad → y_bin."""
+    return _logistic_model_from_stats(age_sufficient_stats(df))
+
+
+def update_logistic_age_model(model: dict, new_rows: pd.DataFrame,
+                              removed_rows: pd.DataFrame | None = None) -> dict:
+    """
+    Incorpora nuevas filas de campaña sin reajustar desde cero: suma sus
+    estadísticos suficientes (y resta los de `removed_rows`, filas eliminadas
+    o sustituidas) y reanuda Newton desde los coeficientes actuales (suele
+    converger en 2-3 iteraciones).
+    """
+    stats = _merge_age_stats(model["stats"], age_sufficient_stats(new_rows))
+    if removed_rows is not None and len(removed_rows):
+        stats = _merge_age_stats(stats, age_sufficient_stats(removed_rows), sign=-1.0)
+    return _logistic_model_from_stats(stats, start=(model["intercept"], model["coef"]))
+
+
+def _logistic_cache_path(version: str) -> Path:
+    return CACHE_DIR / f"logistic_age-{version}.json"
+
+
+def save_logistic_age_model(model: dict, version: str) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for old in CACHE_DIR.glob("logistic_age-*.json"):
+        old.unlink(missing_ok=True)
+    payload = {
+        "version": version,
+        "intercept": model["intercept"],
+        "coef": model["coef"],
+        "stats": {k: v.tolist() for k, v in model["stats"].items()},
+    }
+    path = _logistic_cache_path(version)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _load_logistic_age_model(version: str):
+    path = _logistic_cache_path(version)
+    if not path.exists():
+        return None
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    return {
+        "intercept": payload["intercept"],
+        "coef": payload["coef"],
+        "stats": {k: np.asarray(v, dtype="float64") for k, v in payload["stats"].items()},
+    }
+
+
+def build_logistic_age_model(df: pd.DataFrame) -> dict:
+    """
+    Modelo de la versión actual del dataset: se lee de CACHE_DIR si ya se
+    ajustó (clave = huella del dataset); si no, se ajusta y se guarda.
+    Pensado para get_derived("logistic_age", build_logistic_age_model).
+    Para otros DataFrames (subconjuntos filtrados) solo se ajusta, sin guardar.
+    """
+    current = _DATASET
+    if current is None or current["df"] is not df:
+        return fit_logistic_age_model(df)
+    version = current["version"]
+    model = _load_logistic_age_model(version)
+    if model is None:
+        model = fit_logistic_age_model(df)
+        save_logistic_age_model(model, version)
+    return model
+
+
+def carry_logistic_age_model(old_version: str, new_df: pd.DataFrame,
+                             new_rows: pd.DataFrame, removed_rows: pd.DataFrame) -> bool:
+    """
+    Tras una actualización por filas (sección 15): el modelo de la versión
+    anterior, si está en CACHE_DIR, se actualiza solo con las filas añadidas
+    y retiradas y se guarda con la huella de `new_df`. Así el
+    get_derived("logistic_age", ...) de la nueva versión lo lee en lugar de
+    reajustar desde cero. Devuelve False si no había modelo que actualizar.
+    """
+    model = _load_logistic_age_model(old_version)
+    if model is None:
+        return False
+    model = update_logistic_age_model(model, new_rows, removed_rows)
+    save_logistic_age_model(model, _dataset_fingerprint(new_df))
+    return True
+
+
+def _weighted_percentile(values, counts, q) -> np.ndarray:
+    """
+    Percentiles q (0-100) de unos datos dados como valores distintos
+    ordenados + nº de apariciones. Misma interpolación lineal que
+    np.percentile / Series.quantile sobre los datos expandidos.
+    """
+    values = np.asarray(values, dtype="float64")
+    cum = np.cumsum(counts)
+    pos = (cum[-1] - 1) * np.asarray(q, dtype="float64") / 100
+    lo = np.floor(pos)
+    t = pos - lo
+    v_lo = values[np.searchsorted(cum, lo, side="right")]
+    v_hi = values[np.searchsorted(cum, np.ceil(pos), side="right")]
+    # Igual que el _lerp de NumPy (más estable por el lado más cercano)
+    diff = v_hi - v_lo
+    return np.where(t >= 0.5, v_hi - diff * (1 - t), v_lo + diff * t)
+
+
+def logistic_age_percentiles(model: dict, q) -> np.ndarray:
+    """Percentiles de la edad calculados a partir de los conteos por edad del modelo."""
+    return _weighted_percentile(model["stats"]["age"], model["stats"]["n"], q)
+
+
+def logistic_age_proba(model: dict, ages) -> np.ndarray:
+    """Probabilidad de contratación para las edades dadas (forma cerrada)."""
+    z = model["intercept"] + model["coef"] * np.asarray(ages, dtype="float64")
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# -------------------------------------------------------------------
+# 14. Modo por bloques (generación con memoria acotada)
+# -------------------------------------------------------------------
+# Con EDA_DATA_SOURCE=chunked el CSV bancario se lee por bloques, cada bloque
+# se une con el índice de clientes en memoria, se limpia y se guarda como
+# una partición Feather: la generación nunca tiene el CSV ni el merged sin
+# tipar completos en memoria. Limitación: el dashboard trabaja después con
+# el dataset completo ya tipado (compacto) en memoria, así que este debe
+# caber en RAM: el cubo y los agregados se calculan sobre él, como en los
+# demás modos.
+PARTITIONS_DIR = BASE_PATH / "merged_parts"
+PARTITIONS_MANIFEST = "_manifest.json"
+CHUNK_ROWS = int(os.environ.get("EDA_CHUNK_ROWS", 50_000))
+
+
+def _customer_index() -> pd.DataFrame:
+    """Clientes limpios indexados por id_ (índice hash para unir cada bloque)."""
+    df_cust = _apply_cleaning_spec(_load_raw_customers_from_files())
+    if "ID" in df_cust.columns:
+        df_cust = df_cust.rename(columns={"ID": "id_"})
+    return df_cust.set_index("id_")
+
+
+def _add_value_counts(acc, s: pd.Series) -> pd.Series:
+    counts = s.value_counts()
+    return counts if acc is None else acc.add(counts, fill_value=0)
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    counts = counts.sort_index()
+    return float(_weighted_percentile(counts.index, counts.to_numpy(), [50])[0])
+
+
+def _write_partition_manifest(manifest: dict, directory: Path) -> None:
+    path = directory / PARTITIONS_MANIFEST
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_partition_manifest():
+    """Manifiesto de las particiones (lista, filas, medianas) o None si no hay."""
+    path = PARTITIONS_DIR / PARTITIONS_MANIFEST
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_partitioned_dataset(chunksize: int = CHUNK_ROWS) -> dict:
+    """
+    Genera PARTITIONS_DIR desde bank-additional.csv + customer-details.xlsx
+    sin tener nunca el CSV ni el merged completos en memoria: solo un bloque
+    de `chunksize` filas y el índice de clientes. Las medianas de imputación
+    se calculan con los conteos por valor acumulados (exactas) y se aplican
+    al leer las particiones (iter_partitions). Devuelve el manifiesto.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("EDA_DATA_SOURCE=chunked necesita pyarrow para escribir las particiones.")
+
+    t0 = time.perf_counter()
+    customers = _customer_index()
+    tmp_dir = PARTITIONS_DIR.with_name(f"{PARTITIONS_DIR.name}.{os.getpid()}.tmp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    parts, rows, columns = [], 0, None
+    value_counts = dict.fromkeys(MEDIAN_COLUMNS)
+    reader = pd.read_csv(
+        BANK_PATH,
+        usecols=lambda c: c in BANK_COLUMNS or c == "id_",
+        dtype=BANK_READ_DTYPES,
+        chunksize=chunksize,
+    )
+    for i, chunk in enumerate(reader):
+        part = _apply_cleaning_spec(chunk).join(customers, on="id_", how="inner")
+        part = _add_target_flag(part.drop(columns=["id_"]))
+        for col in MEDIAN_COLUMNS:
+            if col in part.columns:
+                value_counts[col] = _add_value_counts(value_counts[col], part[col])
+
+        name = f"part-{i:05d}.feather"
+        part.reset_index(drop=True).to_feather(tmp_dir / name, compression="uncompressed")
+        parts.append(name)
+        rows += len(part)
+        columns = list(part.columns)
+
+    manifest = {
+        "parts": parts,
+        "rows": rows,
+        "columns": columns,
+        "chunksize": chunksize,
+        "medians": {
+            col: _median_from_counts(counts)
+            for col, counts in value_counts.items()
+            if counts is not None
+        },
+        "version": None,   # huella del dataset, se fija en _build_merged_chunked
+    }
+    _write_partition_manifest(manifest, tmp_dir)
+
+    # Sustitución del directorio: el anterior se aparta y se borra al final
+    old_dir = PARTITIONS_DIR.with_name(f"{PARTITIONS_DIR.name}.{os.getpid()}.old")
+    if PARTITIONS_DIR.exists():
+        os.replace(PARTITIONS_DIR, old_dir)
+    os.replace(tmp_dir, PARTITIONS_DIR)
+    if old_dir.exists():
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"[INFO] {len(parts)} particiones ({rows} filas) generadas en "
+          f"{time.perf_counter() - t0:.2f} s: {PARTITIONS_DIR}")
+    return manifest
+
+
+def iter_partitions(columns=None):
+    """Recorre las particiones ya imputadas y tipadas, una a una."""
+    manifest = read_partition_manifest()
+    if manifest is None:
+        raise FileNotFoundError(f"No hay particiones en {PARTITIONS_DIR}.")
+    for name in manifest["parts"]:
+        part = pd.read_feather(PARTITIONS_DIR / name, columns=columns)
+        part = _fill_missing_with_medians(part, manifest["medians"])
+        yield _apply_dtype_schema(part)
+
+
+def _concat_partitions(parts: list) -> pd.DataFrame:
+    """
+    Une las particiones tipadas. Cada bloque solo conoce las categorías que
+    aparecen en él: sin igualarlas antes, pd.concat convertiría esas columnas
+    a object (texto completo en memoria). Se usa la unión ordenada, la misma
+    que da astype("category") sobre el dataset completo.
+    """
+    for col, kind in DTYPE_SCHEMA.items():
+        if kind != "category" or col not in parts[0].columns:
+            continue
+        categories = union_categoricals(
+            [pd.Categorical([], categories=p[col].cat.categories) for p in parts],
+            sort_categories=True,
+        ).categories
+        for p in parts:
+            p[col] = p[col].cat.set_categories(categories)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _build_merged_chunked() -> pd.DataFrame:
+    """
+    Construcción por bloques: particiones + dataset en memoria ya tipado.
+    El pico de memoria es un bloque sin limpiar más el resultado compacto
+    (nunca el CSV completo, el Excel y el merged sin tipar a la vez); el
+    resultado completo sí queda en memoria, como en los demás modos.
+    """
+    print("[INFO] Generando merged_dataset por bloques (CSV + Excel)...")
+    manifest = build_partitioned_dataset()
+    clean_df = _apply_dtype_schema(_concat_partitions(list(iter_partitions())), report=True)
+    manifest["version"] = _dataset_fingerprint(clean_df)
+    _write_partition_manifest(manifest, PARTITIONS_DIR)
+
+    _write_snapshot(clean_df)
+    _write_merged_csv(clean_df)
+    BUILD_MANIFEST_PATH.unlink(missing_ok=True)   # el modo por bloques no lleva índice de filas
+    print(f"[INFO] merged_dataset.csv generado por bloques en: {MERGED_PATH}")
+    return clean_df
+
+
+# -------------------------------------------------------------------
+# 15. Reconstrucción incremental cuando cambian los ficheros de origen
+# -------------------------------------------------------------------
+# El manifiesto guarda tamaño, mtime y sha256 de bank-additional.csv y
+# customer-details.xlsx, y ROW_INDEX_PATH la clave id_ de cada fila del
+# merged con el hash de sus filas de origen y qué valores se imputaron.
+# Si las fuentes cambian solo se limpian y fusionan las claves nuevas o
+# modificadas; el resto de filas se reutiliza del snapshot.
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _file_signature(path: Path, with_hash: bool = True) -> dict:
+    stat = path.stat()
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        signature["sha256"] = digest.hexdigest()
+    return signature
+
+
+def _source_row_hashes(raw_bank: pd.DataFrame, raw_cust: pd.DataFrame):
+    """
+    Hash de cada fila de origen por clave: (bank por id_, clientes por ID).
+    Devuelve None si alguna clave está repetida (entonces no se puede
+    identificar cada fila y solo cabe la reconstrucción completa).
+    """
+    cust_key = "ID" if "ID" in raw_cust.columns else "id_"
+    if raw_bank["id_"].duplicated().any() or raw_cust[cust_key].duplicated().any():
+        return None
+    bank = pd.Series(pd.util.hash_pandas_object(raw_bank, index=False).to_numpy(),
+                     index=raw_bank["id_"].to_numpy())
+    cust = pd.Series(pd.util.hash_pandas_object(raw_cust, index=False).to_numpy(),
+                     index=raw_cust[cust_key].to_numpy())
+    return bank, cust
+
+
+def _row_index(merged: pd.DataFrame, row_hashes) -> pd.DataFrame | None:
+    """id_ + hash combinado + nulos imputados de cada fila del merged (en su orden)."""
+    if row_hashes is None:
+        return None
+    bank, cust = row_hashes
+    keys = merged["id_"].to_numpy()
+    index = pd.DataFrame({
+        "id_": merged["id_"].astype(str).to_numpy(),
+        "row_hash": bank.loc[keys].to_numpy() ^ (cust.loc[keys].to_numpy() * _HASH_MIX),
+    })
+    for col in MEDIAN_COLUMNS:
+        if col in merged.columns:
+            index[f"imputed_{col}"] = merged[col].isna().to_numpy()
+    return index
+
+
+def _write_build_manifest(clean_df: pd.DataFrame, row_index) -> None:
+    """Guarda el manifiesto y el índice de filas (solo si hay pyarrow y claves únicas)."""
+    if row_index is None or importlib.util.find_spec("pyarrow") is None:
+        BUILD_MANIFEST_PATH.unlink(missing_ok=True)
+        return
+    tmp_rows = ROW_INDEX_PATH.with_suffix(f".feather.{os.getpid()}.tmp")
+    row_index.to_feather(tmp_rows)
+    os.replace(tmp_rows, ROW_INDEX_PATH)
+
+    manifest = {
+        "version": _dataset_fingerprint(clean_df),
+        "rows": len(row_index),
+        "sources": {
+            "bank": _file_signature(BANK_PATH),
+            "customers": _file_signature(CUSTOMER_PATH),
+        },
+    }
+    _save_build_manifest(manifest)
+
+
+def _save_build_manifest(manifest: dict) -> None:
+    """Escritura atómica del manifiesto (siempre bajo _build_lock)."""
+    tmp_path = BUILD_MANIFEST_PATH.with_suffix(f".json.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, BUILD_MANIFEST_PATH)
+
+
+def _read_build_manifest():
+    if not BUILD_MANIFEST_PATH.exists() or not ROW_INDEX_PATH.exists():
+        return None
+    return json.loads(BUILD_MANIFEST_PATH.read_text(encoding="utf-8"))
+
+
+def _changed_sources(manifest) -> tuple:
+    """
+    (fuentes cuyo contenido ha cambiado desde la última construcción,
+    si alguna solo ha cambiado de mtime). Las del segundo caso (mismo
+    sha256) no cuentan como cambio: se anota su firma nueva en `manifest`,
+    sin escribirlo; quien llama lo guarda bajo _build_lock.
+    Sin manifiesto o sin ficheros → nada que comparar.
+    """
+    if manifest is None or DATA_SOURCE == "snapshot":
+        return [], False
+    changed, touched = [], False
+    for name, path in (("bank", BANK_PATH), ("customers", CUSTOMER_PATH)):
+        if not path.exists():
+            return [], False
+        old = manifest["sources"][name]
+        if _file_signature(path, with_hash=False) == {k: old[k] for k in ("size", "mtime_ns")}:
+            continue
+        new = _file_signature(path)
+        if new["sha256"] == old["sha256"]:
+            manifest["sources"][name] = new
+            touched = True
+        else:
+            changed.append(name)
+    return changed, touched
+
+
+def _update_merged_incrementally(df_old: pd.DataFrame, manifest: dict) -> pd.DataFrame:
+    """
+    Nuevo merged a partir del anterior: las filas cuya clave y hash de origen
+    no cambian se reutilizan; las nuevas o modificadas se limpian y fusionan;
+    las que ya no existen se descartan. Las medianas se recalculan sobre el
+    resultado y se vuelven a imputar también en las filas reutilizadas, así
+    que el resultado es el mismo que una reconstrucción completa.
+    """
+    t0 = time.perf_counter()
+    raw_bank = _load_raw_bank_from_files()
+    raw_cust = _load_raw_customers_from_files()
+    row_hashes = _source_row_hashes(raw_bank, raw_cust)
+    old_index = pd.read_feather(ROW_INDEX_PATH)
+    if row_hashes is None or len(old_index) != len(df_old):
+        print("[AVISO] No se puede actualizar por filas: reconstrucción completa.")
+        return _build_merged_from_files()
+
+    # Claves del nuevo merged (orden del CSV bancario) y su hash combinado
+    bank, cust = row_hashes
+    keys = bank.index[bank.index.isin(cust.index)]
+    new_hash = bank.loc[keys].to_numpy() ^ (cust.loc[keys].to_numpy() * _HASH_MIX)
+    str_keys = keys.astype(str)
+
+    old_pos = pd.Series(np.arange(len(old_index)), index=old_index["id_"].to_numpy())
+    pos = old_pos.reindex(str_keys).to_numpy()
+    known = ~np.isnan(pos)
+    reuse = known.copy()
+    reuse[known] = old_index["row_hash"].to_numpy()[pos[known].astype(np.int64)] == new_hash[known]
+    changed_keys = keys[~reuse]
+
+    # Filas reutilizadas: se restauran los nulos que se habían imputado
+    kept_pos = pos[reuse].astype(np.int64)
+    kept = df_old.iloc[kept_pos].copy()
+    for col in MEDIAN_COLUMNS:
+        flag = f"imputed_{col}"
+        if col in kept.columns and flag in old_index.columns:
+            kept[col] = kept[col].mask(old_index[flag].to_numpy()[kept_pos])
+    kept.index = str_keys[reuse]
+
+    # Filas nuevas o modificadas: limpieza + fusión solo de esas claves
+    cust_key = "ID" if "ID" in raw_cust.columns else "id_"
+    fresh = _add_target_flag(_merge_bank_and_customers(
+        _apply_cleaning_spec(raw_bank[raw_bank["id_"].isin(changed_keys)].copy()),
+        _apply_cleaning_spec(raw_cust[raw_cust[cust_key].isin(changed_keys)].copy()),
+    ))
+    fresh.index = fresh["id_"].astype(str).to_numpy()
+    fresh = fresh.drop(columns=["id_"])
+
+    merged = pd.concat([kept, fresh]).loc[str_keys]
+    merged.insert(0, "id_", keys.to_numpy())
+    row_index = _row_index(merged, row_hashes)
+    clean_df = _fill_missing_with_medians(merged.drop(columns=["id_"]).reset_index(drop=True))
+    clean_df = _apply_dtype_schema(clean_df)
+
+    _write_snapshot(clean_df)
+    _write_merged_csv(clean_df)
+    _write_build_manifest(clean_df, row_index)
+
+    # Modelo logístico: solo las filas que cambian. Las reutilizadas pueden
+    # cambiar de edad si se imputó y la mediana es otra; se comparan.
+    new_pos = np.flatnonzero(reuse)
+    cols = ["age", "y_bin"]
+    moved = ~(df_old[cols].iloc[kept_pos].to_numpy(dtype="float64")
+              == clean_df[cols].iloc[new_pos].to_numpy(dtype="float64")).all(axis=1)
+    dropped = np.setdiff1d(np.arange(len(df_old)), kept_pos[~moved])
+    added = np.concatenate([np.flatnonzero(~reuse), new_pos[moved]])
+    carry_logistic_age_model(manifest["version"], clean_df,
+                             clean_df[cols].iloc[added], df_old[cols].iloc[dropped])
+
+    print(f"[INFO] merged actualizado en {time.perf_counter() - t0:.2f} s: "
+          f"{len(fresh)} filas nuevas/modificadas, {int(reuse.sum())} reutilizadas, "
+          f"{len(df_old) - int(reuse.sum())} sustituidas o eliminadas.")
+    return clean_df
+
+
+def _sync_with_sources(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    El merged `df` si está al día con las fuentes; si no, su versión
+    actualizada. La comparación que decide y la escritura del manifiesto se
+    hacen bajo _build_lock: el vigilante de fuentes y /admin/reload (u otro
+    proceso) no pueden pisar un manifiesto nuevo con uno antiguo.
+    """
+    changed, touched = _changed_sources(_read_build_manifest())
+    if not changed and not touched:
+        return df
+
+    with _build_lock():
+        manifest = _read_build_manifest()
+        if manifest is None:
+            return df
+        if manifest["version"] != _dataset_fingerprint(df):
+            # Otro proceso ya lo ha actualizado mientras esperábamos el lock
+            df = _load_existing_merged()
+            manifest = _read_build_manifest()
+            if manifest["version"] != _dataset_fingerprint(df):
+                return df
+        changed, touched = _changed_sources(manifest)
+        if not changed:
+            if touched:
+                _save_build_manifest(manifest)   # solo cambió el mtime
+            return df
+        print("[INFO] Los ficheros de origen han cambiado: actualizando merged por filas...")
+        return _update_merged_incrementally(df, manifest)
+
+
+def refresh_data() -> bool:
+    """
+    Comprueba si bank-additional.csv / customer-details.xlsx han cambiado y,
+    si es así, actualiza el merged y la cache en memoria sin reiniciar
+    (las estructuras derivadas se recalculan con la nueva versión).
+    Devuelve True si los datos han cambiado.
+    """
+    df = load_data()
+    new_df = _sync_with_sources(df)
+    if new_df is df:
+        return False
+    _set_data_cache(new_df)
+    return True
+
+
+# -------------------------------------------------------------------
+# 16. Recarga en caliente (sin reiniciar el proceso)
+# -------------------------------------------------------------------
+def reload_data() -> bool:
+    """
+    Vuelve a cargar el dataset como en el arranque (snapshot / CSV, con
+    actualización incremental si cambiaron las fuentes, o generación) y, si
+    la huella es distinta, sustituye el handle en memoria. Las peticiones en
+    curso terminan con el handle anterior. Devuelve True si hubo cambio.
+    """
+    df = _load_or_build()
+    current = _DATASET
+    if current is not None and _dataset_fingerprint(df) == current["version"]:
+        return False
+    _set_data_cache(df)
+    return True
+
+
+def _run_reload() -> None:
+    try:
+        changed = reload_data()
+        _RELOAD_STATUS.update(changed=changed, error=None)
+    except Exception as exc:    # se informa por /admin/reload, el servidor sigue
+        _RELOAD_STATUS.update(changed=None, error=repr(exc))
+        print(f"[AVISO] La recarga del dataset ha fallado: {exc!r}")
+    finally:
+        _RELOAD_STATUS.update(running=False, finished=time.time())
+        _RELOAD_LOCK.release()
+
+
+def start_reload() -> bool:
+    """
+    Lanza reload_data() en un hilo aparte. Devuelve False si ya hay una
+    recarga en marcha (no se lanzan dos a la vez).
+    """
+    if not _RELOAD_LOCK.acquire(blocking=False):
+        return False
+    _RELOAD_STATUS.update(running=True, started=time.time(), finished=None)
+    threading.Thread(target=_run_reload, name="eda-reload", daemon=True).start()
+    return True
+
+
+def get_reload_status() -> dict:
+    """Estado de la última recarga + versión del dataset en memoria."""
+    dataset = _DATASET
+    return {**_RELOAD_STATUS, "version": dataset["version"] if dataset else None}
+
+
+def start_source_watcher(interval: float) -> threading.Thread:
+    """
+    Hilo en segundo plano que cada `interval` segundos comprueba los ficheros
+    de origen (refresh_data) y publica la nueva versión si han cambiado.
+    """
+    def _watch():
+        while True:
+            time.sleep(interval)
+            if not _RELOAD_LOCK.acquire(blocking=False):
+                continue    # hay una recarga manual en marcha
+            try:
+                if refresh_data():
+                    print(f"[INFO] Dataset recargado: versión {get_data_version()}")
+            except Exception as exc:
+                print(f"[AVISO] Error comprobando los ficheros de origen: {exc!r}")
+            finally:
+                _RELOAD_LOCK.release()
+
+    watcher = threading.Thread(target=_watch, name="eda-source-watcher", daemon=True)
+    watcher.start()
+    return watcher
+
+
+# -------------------------------------------------------------------
+# 17. Memoria del proceso (para comprobar el dataset compartido)
+# -------------------------------------------------------------------
+def get_memory_stats():
+    """
+    RSS del proceso (MB) separado en memoria anónima (propia del proceso:
+    montículo, copias de datos) y respaldada por ficheros (mapeos como el
+    snapshot, compartibles entre procesos), leído de /proc/self/smaps_rollup.
+    Con EDA_SHARED_DATASET=1 el dataset cuenta como respaldado por fichero,
+    así que la memoria anónima de cada proceso del servidor no crece con
+    el tamaño de los datos. None fuera de Linux.
+    """
+    try:
+        lines = Path("/proc/self/smaps_rollup").read_text().splitlines()
+    except OSError:
+        return None
+    kb = {}
+    for line in lines[1:]:
+        key, value = line.split(":", 1)
+        kb[key] = int(value.split()[0])
+    rss, anon = kb.get("Rss", 0), kb.get("Anonymous", 0)
+    return {
+        "pid": os.getpid(),
+        "shared_dataset": SHARED_DATASET,
+        "rss_mb": round(rss / 1024, 1),
+        "pss_mb": round(kb.get("Pss", 0) / 1024, 1),
+        "anon_mb": round(anon / 1024, 1),
+        "file_mb": round((rss - anon) / 1024, 1),
+    }
+
+
+# -------------------------------------------------------------------
+# 18. Índice de segmentos (bitmaps) y filtro global del dashboard
+# -------------------------------------------------------------------
+# Para cada valor de SEGMENT_COLUMNS se guarda la máscara de filas que lo
+# tienen, empaquetada con np.packbits (1 bit por cliente: n/8 bytes). Un
+# segmento (job == "admin.", housing == "yes", y == "yes"...) es un bitmap;
+# combinarlos es un AND / OR de bytes y contarlos un popcount, sin recorrer
+# las columnas del DataFrame.
+# Para la barra de filtros hay además un bitmap por edad entera y por mes de
+# `date` ("AAAA-MM"): los rangos se resuelven con OR de los valores del rango.
+# Las edades no enteras (p. ej. imputadas con una mediana x.5) no tienen
+# bitmap: se guardan aparte (posición y valor) y se comparan exactamente.
+SEGMENT_COLUMNS = [
+    "job", "marital", "education", "default", "housing", "loan",
+    "contact", "poutcome", "y",
+]
+# Columnas categóricas de la barra de filtros (subconjunto de SEGMENT_COLUMNS)
+FILTER_COLUMNS = ["job", "marital", "education", "housing", "loan", "default"]
+
+
+def _packed(mask) -> np.ndarray:
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def build_segment_index(df: pd.DataFrame) -> dict:
+    """
+    Bitmaps por valor de SEGMENT_COLUMNS, por edad y por mes de `date`.
+    Los de cada columna de SEGMENT_COLUMNS son las filas de una matriz
+    (valores × n/8 bytes) en "matrices", para contar todos a la vez.
+    Pensado para get_derived("segment_index", build_segment_index).
+    """
+    bitmaps, matrices = {}, {}
+    for col in SEGMENT_COLUMNS:
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if not isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype("category")
+        codes = s.cat.codes.to_numpy()
+        values = [str(v) for v in s.cat.categories]
+        matrix = np.packbits(codes == np.arange(len(values))[:, None], axis=1)
+        matrices[col] = (values, matrix)
+        bitmaps[col] = dict(zip(values, matrix))
+
+    index = {"n": len(df), "bitmaps": bitmaps, "matrices": matrices}
+
+    if "age" in df.columns:
+        age = df["age"].to_numpy(dtype="float64")
+        valid = ~np.isnan(age)
+        whole = valid & (age == np.floor(age))
+        bitmaps["age"] = {int(a): _packed(age == a) for a in np.unique(age[whole])}
+        other = np.flatnonzero(valid & ~whole)
+        index["age_other"] = {"pos": other, "values": age[other]}
+        if valid.any():
+            index["age_span"] = [int(np.floor(age[valid].min())), int(np.ceil(age[valid].max()))]
+
+    if "date" in df.columns:
+        month = df["date"].dt.strftime("%Y-%m")
+        bitmaps["month"] = {m: _packed(month == m) for m in sorted(month.dropna().unique())}
+
+    return index
+
+
+def _age_range_bitmap(index: dict, lo, hi) -> np.ndarray:
+    """Filas con lo <= age <= hi: bitmaps de las edades enteras + comparación exacta del resto."""
+    empty = np.zeros((index["n"] + 7) // 8, dtype=np.uint8)
+    bitmap = segment_union(empty, *[b for v, b in index["bitmaps"]["age"].items() if lo <= v <= hi])
+    other = index.get("age_other")
+    if other is not None and len(other["pos"]):
+        mask = np.zeros(index["n"], dtype=bool)
+        mask[other["pos"][(other["values"] >= lo) & (other["values"] <= hi)]] = True
+        bitmap = bitmap | _packed(mask)
+    return bitmap
+
+
+def segment(index: dict, col: str, value) -> np.ndarray:
+    """Bitmap de las filas con `col` == `value` (vacío si el valor no existe)."""
+    bitmap = index["bitmaps"].get(col, {}).get(value)
+    if bitmap is None:
+        return np.zeros((index["n"] + 7) // 8, dtype=np.uint8)
+    return bitmap
+
+
+def segment_union(*bitmaps) -> np.ndarray:
+    """Filas que están en alguno de los segmentos (OR)."""
+    return np.bitwise_or.reduce(bitmaps)
+
+
+def segment_intersect(*bitmaps) -> np.ndarray:
+    """Filas que están en todos los segmentos (AND)."""
+    return np.bitwise_and.reduce(bitmaps)
+
+
+# Bits a 1 de cada byte (np.bitwise_count solo existe desde NumPy 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def segment_count(bitmap) -> int:
+    """Nº de filas del segmento (popcount del bitmap)."""
+    return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+
+def segment_counts(index: dict, col: str, within=None) -> pd.DataFrame:
+    """
+    Por cada valor de `col`: nº de clientes (count), conversiones (y_sum) y
+    tasa de conversión (rate), dentro del segmento `within` si se pasa
+    (p. ej. el de filter_bitmap). Mismas columnas que los marginales del cubo.
+    """
+    values, matrix = index["matrices"][col]
+    if within is not None:
+        matrix = matrix & within
+    count = _POPCOUNT[matrix].sum(axis=1, dtype=np.int64)
+    yes = index["bitmaps"].get("y", {}).get("yes")
+    y_sum = (_POPCOUNT[matrix & yes].sum(axis=1, dtype=np.int64)
+             if yes is not None else np.zeros(len(values), dtype=np.int64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(count > 0, y_sum / count, np.nan)
+    return pd.DataFrame(
+        {"count": count, "y_sum": y_sum, "rate": rate},
+        index=pd.Index(values, name=col),
+    )
+
+
+def filter_months(index: dict) -> list:
+    """Meses ("AAAA-MM") con datos, en orden: posiciones del filtro de fecha."""
+    return list(index["bitmaps"].get("month", {}))
+
+
+def filter_bitmap(index: dict, filters: dict | None):
+    """
+    Segmento de las filas que cumplen `filters`:
+      {"age": [min, max], "month": ["AAAA-MM", "AAAA-MM"],
+       "<columna de SEGMENT_COLUMNS>": [valores...]}
+    OR de los valores elegidos en cada columna y AND entre columnas. Las
+    claves vacías o ausentes no filtran. None si no hay ningún filtro.
+    """
+    bitmaps, filters = index["bitmaps"], filters or {}
+    empty = np.zeros((index["n"] + 7) // 8, dtype=np.uint8)
+    selected = []
+
+    for col in SEGMENT_COLUMNS:
+        if filters.get(col) and col in bitmaps:
+            selected.append(segment_union(empty, *[segment(index, col, v) for v in filters[col]]))
+
+    if filters.get("age") and "age" in bitmaps:
+        selected.append(_age_range_bitmap(index, *filters["age"]))
+
+    if filters.get("month") and "month" in bitmaps:
+        lo, hi = filters["month"]
+        selected.append(segment_union(empty, *[b for v, b in bitmaps["month"].items() if lo <= v <= hi]))
+
+    if not selected:
+        return None
+    return segment_intersect(*selected)
+
+
+def filter_mask(index: dict, filters: dict | None):
+    """Máscara booleana de filter_bitmap (None si no hay ningún filtro)."""
+    bitmap = filter_bitmap(index, filters)
+    if bitmap is None:
+        return None
+    return np.unpackbits(bitmap, count=index["n"]).astype(bool)
+
+
+def segment_view(index: dict, filters: dict | None = None) -> dict:
+    """
+    Índice de segmentos + segmento de los filtros activos ("within") y los
+    propios filtros, para que los controladores cuenten sobre la selección
+    sin filtrar el DataFrame.
+    """
+    return {"index": index, "within": filter_bitmap(index, filters), "filters": filters or {}}
+
+
+def filters_key(filters: dict | None) -> str:
+    """Forma canónica de `filters` (sin claves vacías) para usarla en caches."""
+    active = {k: v for k, v in (filters or {}).items() if v}
+    return json.dumps(active, sort_keys=True, ensure_ascii=False) if active else ""
+
+
+def apply_filters(df: pd.DataFrame, filters: dict | None, index: dict | None = None) -> pd.DataFrame:
+    """
+    Subconjunto de `df` que cumple `filters` (el propio df si no hay filtros).
+    `index` es el de build_segment_index(df); por defecto el del dataset en memoria.
+    """
+    if not filters_key(filters):
+        return df
+    if index is None:
+        index = get_derived("segment_index", build_segment_index, df)
+    mask = filter_mask(index, filters)
+    if mask is None:
+        return df
+    return df[mask].reset_index(drop=True)
+
+
+# Derivadas de subconjuntos filtrados que se guardan por handle (LRU)
+FILTERED_DERIVED_MAX = int(os.environ.get("EDA_FILTERED_DERIVED_MAX", "32"))
+
+
+def get_filtered_derived(name: str, builder, filters: dict | None, dataset: dict | None = None):
+    """
+    Como get_derived, para la selección `filters` del dataset: builder se
+    aplica al subconjunto (apply_filters) una vez por (versión, filtros), no
+    en cada petición. Se guardan en el handle las FILTERED_DERIVED_MAX
+    entradas usadas más recientemente. `dataset` es el handle con el que
+    trabaja la petición (por defecto el actual). Sin filtros = get_derived.
+    """
+    dataset = dataset or get_dataset()
+    key = (name, filters_key(filters))
+    if not key[1]:
+        return get_derived(name, builder, dataset["df"])
+
+    with dataset["lock"]:
+        cache = dataset["derived"].setdefault("filtered", OrderedDict())
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    # Fuera del lock: el resto de derivadas del handle no esperan a esta
+    value = builder(apply_filters(dataset["df"], filters))
+    with dataset["lock"]:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > FILTERED_DERIVED_MAX:
+            cache.popitem(last=False)
+    return value
+
+
+# -------------------------------------------------------------------
+# 19. Histogramas con densidad (KDE binned por FFT)
+# -------------------------------------------------------------------
+# Puntos de la rejilla de la KDE. Tras agrupar los datos en ella, el coste
+# ya no depende del número de clientes: O(n) para binning + O(G log G)
+KDE_GRIDSIZE = 256
+
+
+def binned_kde(values, bandwidth: float, lo: float, hi: float, gridsize: int = KDE_GRIDSIZE):
+    """
+    Densidad gaussiana evaluada en una rejilla regular [lo, hi] de `gridsize`
+    puntos. Cada observación se reparte entre los dos puntos vecinos
+    (binning lineal) y la rejilla se convoluciona con el núcleo por FFT.
+    Devuelve (x, densidad) con la densidad integrando ~1.
+    """
+    data = np.asarray(values, dtype="float64")
+    x = np.linspace(lo, hi, gridsize)
+    delta = x[1] - x[0]
+
+    # Binning lineal: peso (1 - frac) al punto de la izquierda y frac al de la derecha
+    pos = (data - lo) / delta
+    left = np.clip(np.floor(pos).astype(np.int64), 0, gridsize - 2)
+    frac = np.clip(pos - left, 0.0, 1.0)
+    weights = (np.bincount(left, weights=1.0 - frac, minlength=gridsize)
+               + np.bincount(left + 1, weights=frac, minlength=gridsize))
+
+    # Núcleo truncado a 4 anchos de banda; el relleno con ceros evita que la FFT "dé la vuelta"
+    reach = min(gridsize - 1, int(np.ceil(4 * bandwidth / delta)))
+    offsets = np.arange(-reach, reach + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    size = 1 << int(np.ceil(np.log2(gridsize + 2 * reach + 1)))
+    smooth = np.fft.irfft(np.fft.rfft(weights, size) * np.fft.rfft(kernel, size), size)
+    density = smooth[reach:reach + gridsize] / len(data)
+
+    return x, np.maximum(density, 0.0)
+
+
+def build_histogram_density(values, bins: int) -> dict:
+    """
+    Histograma (np.histogram) + curva de densidad en la escala de los conteos,
+    como histplot(kde=True) de Seaborn: ancho de banda de Scott y rejilla
+    entre el mínimo y el máximo observados. La curva es None si no hay
+    variación (menos de dos valores distintos).
+    """
+    data = pd.Series(values).dropna().to_numpy(dtype="float64")
+    counts, edges = np.histogram(data, bins=bins)
+    result = {"n": len(data), "counts": counts, "edges": edges, "x": None, "curve": None}
+
+    std = data.std(ddof=1) if len(data) > 1 else 0.0
+    if std > 0:
+        bandwidth = std * len(data) ** (-1 / 5)
+        x, density = binned_kde(data, bandwidth, data.min(), data.max())
+        # Escala de conteos: densidad · n · ancho de tramo
+        result["x"] = x
+        result["curve"] = density * len(data) * (edges[1] - edges[0])
+    return result
+
+
+def get_histogram_density(df: pd.DataFrame, col: str, bins: int) -> dict:
+    """
+    Histograma + KDE de `col` con `bins` tramos, cacheado por versión del
+    dataset y compartido por los gráficos Matplotlib y Plotly.
+    """
+    return get_derived(f"histogram_density:{col}:{bins}",
+                       lambda data: build_histogram_density(data[col], bins), df)
@@ -0,0 +1,68 @@
+import argparse
+import sys
+
+from views.layout import FIGURE_BUDGET_KB, payload_budget_report
+from models.data_model import load_data
+
+# ============= PRESUPUESTO DE TAMAÑO =============
+#
+# Informe del tamaño de las respuestas del dashboard: por pestaña y por
+# figura, en bytes del JSON y comprimido con gzip. Sale con código 1 si
+# alguna figura supera el presupuesto, para detectar las regresiones que
+# hacen lenta la página en conexiones lentas (VPN).
+#
+#   python payload_budget.py                     # presupuesto EDA_FIGURE_BUDGET_KB
+#   python payload_budget.py --max-figure-kb 80 --max-tab-kb 300
+#
+# =================================================
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Informe de tamaño de las respuestas del dashboard.")
+    parser.add_argument(
+        "--max-figure-kb",
+        type=float,
+        default=FIGURE_BUDGET_KB,
+        help=f"Máximo por figura en KB (por defecto EDA_FIGURE_BUDGET_KB = {FIGURE_BUDGET_KB:g}).",
+    )
+    parser.add_argument(
+        "--max-tab-kb",
+        type=float,
+        default=None,
+        help="Máximo por respuesta de pestaña en KB (por defecto sin límite).",
+    )
+    parser.add_argument(
+        "--sin-gzip",
+        action="store_true",
+        help="Comparar el presupuesto con el JSON sin comprimir (por defecto, con gzip).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    load_data()
+
+    size_key = "bytes" if args.sin_gzip else "gzip_bytes"
+    rows = payload_budget_report()
+
+    print(f"{'Pestaña':<17} {'Elemento':<52} {'JSON (KB)':>10} {'gzip (KB)':>10}")
+    excesos = []
+    for row in rows:
+        limit = args.max_tab_kb if row["kind"] == "tab" else args.max_figure_kb
+        over = limit is not None and row[size_key] > limit * 1000
+        marca = "  ← supera el presupuesto" if over else ""
+        print(f"{row['tab']:<17} {row['item'][:52]:<52} "
+              f"{row['bytes'] / 1000:>10.1f} {row['gzip_bytes'] / 1000:>10.1f}{marca}")
+        if over:
+            excesos.append(row)
+
+    if excesos:
+        print(f"[AVISO] {len(excesos)} elemento(s) superan el presupuesto "
+              f"({'JSON' if args.sin_gzip else 'gzip'}).")
+        sys.exit(1)
+    print("[INFO] Todas las respuestas están dentro del presupuesto.")
+
+
+if __name__ == "__main__":
+    main()
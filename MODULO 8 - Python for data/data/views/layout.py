@@ -1,7 +1,78 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
 from dash import html, dcc, dash_table
-from models.data_model import load_data
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson   # dependencia opcional: codificación/decodificación JSON rápida
+except ImportError:
+    orjson = None
+from models.data_model import (
+    FILTER_COLUMNS,
+    IMAGE_CACHE_DIR,
+    apply_filters,
+    build_aggregate_cube,
+    build_segment_index,
+    build_geo_coords,
+    build_logistic_age_model,
+    cube_for_filters,
+    dataset_version,
+    filter_months,
+    filters_key,
+    segment_view,
+    get_data_version,
+    get_dataset,
+    get_derived,
+    load_data,
+)
 from controllers import eda_controller as ec
 
+# Cache del layout completo: se construye una vez por versión del dataset
+_LAYOUT_CACHE = {"version": None, "layout": None}
+_LAYOUT_STATS = {"hits": 0, "misses": 0}
+_LAYOUT_LOCK = threading.Lock()
+
+# Cache LRU de respuestas ya serializadas (contenido de pestañas y figuras de
+# los callbacks): {(versión, tipo, ...): bytes JSON compactos}. Al pedirlas
+# se entregan a Dash como dict/list JSON puros, que se vuelven a codificar
+# sin recorrer componentes ni validar figuras Plotly.
+_PAYLOAD_CACHE = OrderedDict()
+_PAYLOAD_STATS = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0, "bytes_saved": 0}
+_PAYLOAD_LOCK = threading.Lock()
+PAYLOAD_CACHE_MAX_BYTES = int(float(os.environ.get("EDA_PAYLOAD_CACHE_MB", "64")) * 1_000_000)
+
+# Presupuesto de tamaño por figura (KB comprimidos con gzip), ver payload_budget.py
+FIGURE_BUDGET_KB = float(os.environ.get("EDA_FIGURE_BUDGET_KB", "150"))
+
+# Tiempos de la última ejecución de cada sección: {(pestaña, sección): segundos}
+_SECTION_TIMINGS = {}
+_SECTION_LOCK = threading.Lock()
+# Trabajadores para calcular en paralelo las secciones de una pestaña.
+# Las imágenes Matplotlib (CPU pura, no sueltan el GIL) pueden ir en procesos
+# con EDA_SECTION_EXECUTOR=process; el resto de secciones siempre en hilos.
+SECTION_WORKERS = int(os.environ.get("EDA_SECTION_WORKERS", min(8, os.cpu_count() or 1)))
+SECTION_EXECUTOR = os.environ.get("EDA_SECTION_EXECUTOR", "thread").strip().lower()
+
+DEFAULT_TAB = "tab-resumen"
+
+# Ruta Flask (ver app.py) que sirve los PNG de IMAGE_CACHE_DIR
+IMAGE_ROUTE = "/img-cache/"
+
+_GRAPH_STYLE = {
+    "height": "310px",   # o la altura que estés usando
+    "width": "100%",     # importante para que respete el ancho de la tarjeta
+}
+_GRAPH_CONFIG = {"responsive": False, "displayModeBar": False}
+
 
 def _metric_card(title: str, value: str):
     return html.Div(
@@ -13,51 +84,444 @@ def _metric_card(title: str, value: str):
     )
 
 
-def serve_layout():
-    df = load_data()
+def _write_atomic(path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _cached_image(name: str, render, df):
+    """
+    Imagen Matplotlib `name` de la versión del dataset `df`, renderizada
+    una sola vez con render(df) y guardada en IMAGE_CACHE_DIR:
+      - <sha256 del PNG>.png: el fichero se nombra por su contenido, así que
+        nunca cambia y el navegador lo puede cachear indefinidamente.
+      - <sha256 de versión + nombre>.json: PNG y texto de esa versión; si ya
+        existe (otro worker, arranque anterior) no se vuelve a renderizar.
+    Devuelve (URL de la imagen | None, texto).
+    """
+    key = hashlib.sha256(f"{dataset_version(df)}:{name}".encode()).hexdigest()[:20]
+    meta_path = IMAGE_CACHE_DIR / f"{key}.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    else:
+        png, texto = render(df)
+        meta = {"png": None, "texto": texto}
+        IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if png is not None:
+            meta["png"] = f"{hashlib.sha256(png).hexdigest()[:20]}.png"
+            png_path = IMAGE_CACHE_DIR / meta["png"]
+            if not png_path.exists():
+                _write_atomic(png_path, png)
+        # El .json se escribe el último: si existe, el PNG ya está completo
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    url = IMAGE_ROUTE + meta["png"] if meta["png"] else None
+    return url, meta["texto"]
+
+
+def _inline_image(render, df):
+    """
+    Imagen Matplotlib render(df) embebida como data URI, sin pasar por
+    IMAGE_CACHE_DIR. Para los subconjuntos filtrados: una entrada en disco
+    por combinación de filtros haría crecer la cache sin límite; embebida
+    viaja dentro del payload de la pestaña, que ya se cachea en memoria (LRU
+    acotada por PAYLOAD_CACHE_MAX_BYTES). Devuelve (data URI | None, texto).
+    """
+    png, texto = render(df)
+    if png is None:
+        return None, texto
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii"), texto
+
+
+def _img_block(img_src, alt_txt, insight):
+    if img_src is None:
+        return html.Div(insight, className="graph-insight")
+    return html.Div(
+        className="img-card",
+        children=[
+            html.Img(
+                src=img_src,
+                alt=alt_txt,
+                className="img-plot",
+            ),
+            html.P(insight, className="graph-insight"),
+        ],
+    )
+
 
-    # Numéricas (Matplotlib / Seaborn)
-    age_img, age_txt = ec.get_age_distribution_image(df)
-    income_img, income_txt = ec.get_income_distribution_image(df)
-    numweb_img, numweb_txt = ec.get_numwebvisits_distribution_image(df)
-    kidteen_img, kidteen_txt = ec.get_kidteen_distribution_image(df)
-
-    # Categóricas / financieras (Plotly)
-    fig_marital, marital_txt = ec.get_marital_distribution_figure(df)
-    fig_job, job_txt = ec.get_job_distribution_figure(df)
-    fig_education, edu_txt = ec.get_education_distribution_figure(df)
-
-    # Conversión y correlaciones
-    fig_conv_age, txt_conv_age = ec.get_conversion_by_age_figure(df)
-    fig_conv_income, txt_conv_income = ec.get_conversion_by_income_figure(df)
-    fig_conv_web, txt_conv_web = ec.get_conversion_by_webvisits_figure(df)
-    fig_conv_prev, txt_conv_prev = ec.get_conversion_by_previous_figure(df)
-    fig_log_age, txt_log_age = ec.get_logistic_age_curve_figure(df)
-    fig_corr, txt_corr = ec.get_target_correlation_heatmap(df)
-
-    fig_target_donut = ec.get_target_donut_figure(df)
-    fig_marital_donut = ec.get_marital_donut_figure(df)
-
-    fig_housing, housing_txt = ec.get_binary_financial_figure(
-        df, "housing", "Situación hipotecaria de los clientes"
+def _graph_block(fig, insight):
+    return html.Div(
+        className="graph-with-text",
+        children=[
+            dcc.Graph(
+                figure=fig,
+                className="graph-card",
+                style=_GRAPH_STYLE,
+                config=_GRAPH_CONFIG,
+            ),
+            html.P(insight, className="graph-insight"),
+        ],
+    )
+
+
+def _optional_graph_block(fig, insight, height: str = "320px"):
+    """Gráfico + texto, o solo el texto si la figura no se ha podido generar."""
+    return html.Div(
+        className="graph-with-text",
+        children=[
+            dcc.Graph(
+                figure=fig,
+                className="graph-card",
+                style={"height": height, "width": "100%"},
+                config={"responsive": True, "displayModeBar": False},
+            )
+            if fig is not None
+            else html.Div(insight, className="graph-insight"),
+            html.P(insight, className="graph-insight")
+            if fig is not None
+            else None,
+        ],
     )
-    fig_loan, loan_txt = ec.get_binary_financial_figure(
-        df, "loan", "Clientes con préstamo personal"
+
+
+def serve_layout():
+    """
+    Dash llama a esta función en cada carga de página.
+    Devuelve el árbol de componentes cacheado y solo lo reconstruye
+    cuando cambia la huella (versión) del dataset fusionado.
+    """
+    version = get_data_version()
+
+    with _LAYOUT_LOCK:
+        if _LAYOUT_CACHE["version"] == version:
+            _LAYOUT_STATS["hits"] += 1
+            return _LAYOUT_CACHE["layout"]
+
+        _LAYOUT_STATS["misses"] += 1
+        layout = _build_layout()
+        _LAYOUT_CACHE["version"] = version
+        _LAYOUT_CACHE["layout"] = layout
+        return layout
+
+
+def get_layout_cache_stats() -> dict:
+    """Contadores de aciertos/fallos de la cache del layout y de las pestañas."""
+    return {
+        **_LAYOUT_STATS,
+        "version": _LAYOUT_CACHE["version"],
+        "payloads": {**_PAYLOAD_STATS, "entries": len(_PAYLOAD_CACHE),
+                     "max_bytes": PAYLOAD_CACHE_MAX_BYTES},
+        "sections": {f"{tab}/{name}": round(secs, 4)
+                     for (tab, name), secs in _SECTION_TIMINGS.items()},
+    }
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run_sections(tab: str, tasks: dict, processes: bool = False) -> dict:
+    """
+    Ejecuta en paralelo las secciones independientes de una pestaña
+    ({nombre: función sin argumentos}) y devuelve {nombre: resultado} cuando
+    terminan todas: el tiempo total lo marca la sección más lenta, no la suma.
+    Con processes=True usa un pool de procesos (las funciones y sus
+    resultados deben poder serializarse con pickle).
+    El tiempo de cada sección queda en get_layout_cache_stats()["sections"].
+    """
+    start = time.perf_counter()
+    workers = max(1, min(SECTION_WORKERS, len(tasks)))
+    if processes and workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eda-section")
+    with pool:
+        futures = {name: pool.submit(_timed, func) for name, func in tasks.items()}
+        timed = {name: future.result() for name, future in futures.items()}
+
+    results = {}
+    with _SECTION_LOCK:
+        for name, (result, secs) in timed.items():
+            results[name] = result
+            _SECTION_TIMINGS[(tab, name)] = secs
+
+    slowest = max(timed, key=lambda name: timed[name][1], default=None)
+    if slowest is not None:
+        print(
+            f"[INFO] {tab}: {len(tasks)} secciones en {time.perf_counter() - start:.2f} s "
+            f"(más lenta: {slowest}, {timed[slowest][1]:.2f} s)"
+        )
+    return results
+
+
+def warm_up_tabs() -> None:
+    """Construye todas las pestañas a la vez (p. ej. al arrancar el servidor)."""
+    run_sections("warm-up", {tab: partial(render_tab, tab) for tab in _TAB_BUILDERS})
+
+
+def _encode_payload(obj) -> bytes:
+    """JSON compacto de componentes Dash / figuras (motor orjson de Plotly si está)."""
+    return to_json_plotly(obj).encode("utf-8")
+
+
+def _decode_payload(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def cached_payload(key: tuple, build):
+    """
+    Respuesta `key` = (versión del dataset, ...) desde la cache LRU de
+    payloads; si no está, se construye con build(), se serializa una vez y
+    se guarda. Devuelve siempre el JSON decodificado (dict / list puros).
+    Se descartan las entradas de otras versiones y, por tamaño, las menos
+    usadas recientemente hasta no superar PAYLOAD_CACHE_MAX_BYTES.
+    """
+    with _PAYLOAD_LOCK:
+        data = _PAYLOAD_CACHE.get(key)
+        if data is not None:
+            _PAYLOAD_CACHE.move_to_end(key)
+            _PAYLOAD_STATS["hits"] += 1
+            _PAYLOAD_STATS["bytes_saved"] += len(data)
+            return _decode_payload(data)
+        _PAYLOAD_STATS["misses"] += 1
+
+    # Fuera del lock: así varias respuestas se pueden construir a la vez
+    data = _encode_payload(build())
+
+    with _PAYLOAD_LOCK:
+        current = get_data_version()
+        if key[0] == current and key not in _PAYLOAD_CACHE:   # si no, versión ya sustituida
+            for old_key in [k for k in _PAYLOAD_CACHE if k[0] != current]:
+                _PAYLOAD_STATS["bytes"] -= len(_PAYLOAD_CACHE.pop(old_key))
+            _PAYLOAD_CACHE[key] = data
+            _PAYLOAD_STATS["bytes"] += len(data)
+            while _PAYLOAD_STATS["bytes"] > PAYLOAD_CACHE_MAX_BYTES and len(_PAYLOAD_CACHE) > 1:
+                _, old = _PAYLOAD_CACHE.popitem(last=False)
+                _PAYLOAD_STATS["bytes"] -= len(old)
+                _PAYLOAD_STATS["evictions"] += 1
+    return _decode_payload(data)
+
+
+def clear_payload_cache() -> None:
+    """Vacía la cache de payloads (p. ej. para medir o comprobar el render sin cache)."""
+    with _PAYLOAD_LOCK:
+        _PAYLOAD_CACHE.clear()
+        _PAYLOAD_STATS["bytes"] = 0
+
+
+def _payload_items(node):
+    """Figuras (dcc.Graph) e imágenes cacheadas o embebidas (html.Img) de un payload JSON."""
+    if isinstance(node, list):
+        for child in node:
+            yield from _payload_items(child)
+        return
+    if not isinstance(node, dict) or "props" not in node:
+        return
+    props = node["props"]
+    if node.get("type") == "Graph" and props.get("figure"):
+        figure = props["figure"]
+        title = figure.get("layout", {}).get("title", {})
+        yield "figure", props.get("id") or (title.get("text") if isinstance(title, dict) else None), figure
+    elif (node.get("type") == "Img"
+          and str(props.get("src", "")).startswith((IMAGE_ROUTE, "data:image/"))):
+        yield "image", props.get("alt"), props["src"]
+    yield from _payload_items(props.get("children"))
+
+
+def payload_budget_report(tabs=None, filters: dict | None = None) -> list:
+    """
+    Tamaño de la respuesta de cada pestaña y de cada figura que contiene:
+    bytes del JSON ("bytes") y comprimido con gzip ("gzip_bytes"), tal como
+    viaja con la compresión de app.py. Los PNG de IMAGE_CACHE_DIR se piden
+    aparte y ya van comprimidos: se mide el fichero. Los embebidos (vistas
+    filtradas) se miden como su data URI, que ya cuenta en la pestaña.
+    """
+    rows = []
+    for tab in tabs or _TAB_BUILDERS:
+        payload = render_tab(tab, filters)
+        data = _encode_payload(payload)
+        rows.append({"tab": tab, "kind": "tab", "item": "(respuesta completa)",
+                     "bytes": len(data), "gzip_bytes": len(gzip.compress(data))})
+        for i, (kind, name, value) in enumerate(_payload_items(payload), start=1):
+            if kind == "figure":
+                raw = _encode_payload(value)
+                size, gz = len(raw), len(gzip.compress(raw))
+            elif value.startswith(IMAGE_ROUTE):
+                size = gz = (IMAGE_CACHE_DIR / value.removeprefix(IMAGE_ROUTE)).stat().st_size
+            else:
+                size, gz = len(value), len(gzip.compress(value.encode("ascii")))
+            rows.append({"tab": tab, "kind": kind, "item": name or f"{kind} {i}",
+                         "bytes": size, "gzip_bytes": gz})
+    return rows
+
+
+def render_tab(tab: str, filters: dict | None = None):
+    """
+    Contenido de una pestaña. Solo se calculan las figuras de la pestaña
+    pedida y el resultado se memoriza, ya serializado, por (versión del
+    dataset, pestaña, filtros). Con `filters` (barra de filtros global) las
+    figuras se calculan sobre el subconjunto seleccionado con los bitmaps
+    del índice.
+    """
+    builder = _TAB_BUILDERS.get(tab)
+    if builder is None:
+        return html.Div()
+
+    # Datos y versión del mismo handle: si hay una recarga a mitad, esta
+    # petición termina entera con la versión con la que empezó
+    dataset = get_dataset()
+    df, version = dataset["df"], dataset["version"]
+
+    def build():
+        # Los recuentos por categoría salen del índice de segmentos (dataset
+        # completo + bitmap de los filtros); el resto, del subconjunto filtrado.
+        index = get_derived("segment_index", build_segment_index, df)
+        segments = segment_view(index, filters)
+        sub = apply_filters(df, filters, index)
+        if sub.empty:
+            return html.Section(
+                className="section",
+                children=html.P("Ningún cliente cumple los filtros seleccionados.",
+                                className="graph-insight"),
+            )
+        return builder(sub, segments)
+
+    return cached_payload((version, "tab", tab, filters_key(filters)), build)
+
+
+def _build_layout():
+    """Estructura fija de la página; el contenido de cada pestaña se carga bajo demanda."""
+    return html.Div(
+        className="page-container",
+        children=[
+            html.Header(
+                className="header",
+                children=[
+                    html.H1("EDA – Campaña de Depósitos a Plazo", className="title"),
+                    html.P(
+                        "Dashboard descriptivo profesional del dataset fusionado de clientes y campaña.",
+                        className="subtitle",
+                    ),
+                ],
+            ),
+            _filter_bar(),
+            dcc.Tabs(
+                id="tabs-eda",
+                value=DEFAULT_TAB,
+                children=[
+                    dcc.Tab(label="1. Resumen e información general", value="tab-resumen"),
+                    dcc.Tab(label="2. Variables numéricas (Niños/Adolescentes)", value="tab-numericas"),
+                    dcc.Tab(label="3. Variables categóricas", value="tab-categoricas"),
+                    dcc.Tab(label="4. Variables financieras y objetivo", value="tab-financieras"),
+                    dcc.Tab(label="5. Coordenadas geográficas", value="tab-geo"),
+                    dcc.Tab(label="6. Conversión y correlaciones", value="tab-conversion"),
+                ],
+            ),
+            # La pestaña inicial se sirve ya renderizada; el resto llega por callback
+            html.Div(id="tab-content", children=render_tab(DEFAULT_TAB)),
+        ],
     )
-    fig_default, default_txt = ec.get_binary_financial_figure(
-        df, "default", "Historial de impago (default)"
+
+
+_FILTER_LABELS = {
+    "job": "Profesión",
+    "marital": "Estado civil",
+    "education": "Educación",
+    "housing": "Hipoteca",
+    "loan": "Préstamo personal",
+    "default": "Impago (default)",
+}
+
+
+def _filter_bar():
+    """
+    Barra de filtros global: el callback de app.py guarda la selección en
+    el Store "filtros-globales" y todas las pestañas se recalculan con ella.
+    """
+    df = load_data()
+    index = get_derived("segment_index", build_segment_index, df)
+    ages = index.get("age_span", [18, 90])
+    months = filter_months(index)
+
+    dropdowns = [
+        html.Div(children=[
+            html.Label(_FILTER_LABELS[col], className="filter-label"),
+            dcc.Dropdown(
+                id=f"filtro-{col}",
+                options=list(index["bitmaps"][col]),
+                multi=True,
+                placeholder="Todos",
+            ),
+        ])
+        for col in FILTER_COLUMNS
+        if col in index["bitmaps"]
+    ]
+
+    return html.Section(
+        className="section filter-bar",
+        children=[
+            dcc.Store(id="filtros-globales", data={}),
+            html.Div(className="filter-grid", children=dropdowns),
+            html.Div(className="grid-2", children=[
+                html.Div(children=[
+                    html.Label("Edad", className="filter-label"),
+                    dcc.RangeSlider(
+                        id="filtro-edad",
+                        min=min(ages),
+                        max=max(ages),
+                        step=1,
+                        value=[min(ages), max(ages)],
+                        marks={a: str(a) for a in range(20, max(ages) + 1, 10)},
+                        tooltip={"placement": "bottom", "always_visible": False},
+                    ),
+                ]),
+                html.Div(children=[
+                    html.Label("Fecha de contacto (mes)", className="filter-label"),
+                    dcc.RangeSlider(
+                        id="filtro-fecha",
+                        min=0,
+                        max=max(len(months) - 1, 0),
+                        step=1,
+                        value=[0, max(len(months) - 1, 0)],
+                        marks={i: m for i, m in enumerate(months) if m.endswith("-01")},
+                    ),
+                ]),
+            ]),
+        ],
     )
 
-    fig_y, y_txt = ec.get_target_distribution_figure(df)
 
-    # Mapa geográfico
-    fig_geo, geo_txt = ec.get_geo_density_figure(df)
+def filters_from_controls(values: dict, age_range, month_range) -> dict:
+    """
+    Convierte el estado de la barra de filtros en el dict de filtros de
+    data_model.filter_mask. Los rangos completos no se guardan (no filtran).
+    """
+    index = get_derived("segment_index", build_segment_index)
+    ages = index.get("age_span", [])
+    months = filter_months(index)
 
+    filters = {col: sorted(v) for col, v in values.items() if v}
+    if age_range and ages and list(age_range) != [min(ages), max(ages)]:
+        filters["age"] = list(age_range)
+    if month_range and months and list(month_range) != [0, len(months) - 1]:
+        filters["month"] = [months[month_range[0]], months[month_range[1]]]
+    return filters
+
+
+# ======================================================
+# PESTAÑAS
+# ======================================================
+
+def _tab_resumen(df, segments):
     # Métricas globales, info y tabla descriptiva
-    metrics = ec.generate_summary_metrics(df)
-    dataset_info_md = ec.generate_dataset_info_text(df)
-    conclusions_md = ec.generate_conclusions_text(df)
-    desc_df = ec.get_descriptive_table(df)
+    res = run_sections("tab-resumen", {
+        "metrics": partial(ec.generate_summary_metrics, df, segments=segments),
+        "descriptive": partial(ec.get_descriptive_table, df),
+    })
+    metrics, desc_df = res["metrics"], res["descriptive"]
 
     desc_table = dash_table.DataTable(
         data=desc_df.to_dict("records"),
@@ -95,467 +559,426 @@ def serve_layout():
         ],
     )
 
+    return [
+        html.Section(
+            className="section metrics-section",
+            children=[
+                html.H2(
+                    "Información general del dataset",
+                    className="section-title",
+                ),
+                html.Div(
+                    className="metrics-grid",
+                    children=[
+                        _metric_card(
+                            "Total registros",
+                            f"{metrics['total_registros']:,}",
+                        ),
+                        _metric_card(
+                            "Total variables",
+                            f"{metrics['total_variables']}",
+                        ),
+                        _metric_card(
+                            "Tasa de conversión (y = yes)",
+                            f"{metrics['tasa_conversion']:.2f} %"
+                            if metrics["tasa_conversion"] is not None
+                            else "N/D",
+                        ),
+                        _metric_card(
+                            "Edad media",
+                            f"{metrics['edad_media']:.1f} años"
+                            if metrics["edad_media"] is not None
+                            else "N/D",
+                        ),
+                        _metric_card(
+                            "Ingreso medio",
+                            f"{metrics['ingreso_medio']:,.0f}"
+                            if metrics["ingreso_medio"] is not None
+                            else "N/D",
+                        ),
+                        _metric_card(
+                            "% con hipoteca",
+                            f"{metrics['porc_housing_yes']:.1f} %"
+                            if metrics["porc_housing_yes"] is not None
+                            else "N/D",
+                        ),
+                        _metric_card(
+                            "% con préstamo personal",
+                            f"{metrics['porc_loan_yes']:.1f} %"
+                            if metrics["porc_loan_yes"] is not None
+                            else "N/D",
+                        ),
+                    ],
+                ),
+            ],
+        ),
+        html.Section(
+            className="section",
+            children=[
+                html.H2(
+                    "Estadísticos descriptivos globales",
+                    className="section-title",
+                ),
+                html.P(
+                    "Tabla de media, desviación estándar, mínimos, máximos y percentiles "
+                    "para las principales variables numéricas.",
+                    className="subtitle",
+                ),
+                desc_table,
+            ],
+        ),
+    ]
+
+
+_NUMERIC_CHARTS = [
+    # (nombre, imagen Matplotlib, histograma Plotly, texto alternativo)
+    ("age", ec.get_age_distribution_image, ec.get_age_histogram_figure,
+     "Distribución de la edad"),
+    ("income", ec.get_income_distribution_image, ec.get_income_histogram_figure,
+     "Distribución del ingreso"),
+    ("numweb", ec.get_numwebvisits_distribution_image, ec.get_numwebvisits_histogram_figure,
+     "Visitas web mensuales"),
+    ("kidteen", ec.get_kidteen_distribution_image, ec.get_kidteen_histogram_figure,
+     "Menores en el hogar"),
+]
 
-    graph_style = {
-        "height": "310px",   # o la altura que estés usando
-        "width": "100%",     # importante para que respete el ancho de la tarjeta
-    }
-    graph_config = {"responsive": True, "displayModeBar": False}
 
-    graph_config = {"responsive": False, "displayModeBar": False}
+def _numeric_image_task(name: str, filters: dict | None = None, df=None):
+    """
+    Imagen cacheada de _NUMERIC_CHARTS por nombre. En otro proceso se llama
+    solo con el nombre y los filtros (deben poder serializarse): el dataset
+    se toma de load_data() (ya en memoria tras el fork, o leído del
+    snapshot) y el subconjunto se vuelve a seleccionar ahí con apply_filters.
+    """
+    image = next(image for key, image, _, _ in _NUMERIC_CHARTS if key == name)
+    if df is None:
+        df = apply_filters(load_data(), filters)
+    if filters_key(filters):
+        return _inline_image(image, df)
+    return _cached_image(name, image, df)
+
+
+def _tab_numericas(df, segments):
+    # Numéricas: PNG Matplotlib / Seaborn cacheados o histogramas Plotly
+    if ec.NUMERIC_CHARTS == "plotly":
+        res = run_sections("tab-numericas", {
+            name: partial(histogram, df) for name, _, histogram, _ in _NUMERIC_CHARTS
+        })
+        blocks = [_optional_graph_block(*res[name]) for name, _, _, _ in _NUMERIC_CHARTS]
+    else:
+        processes = SECTION_EXECUTOR == "process"
+        res = run_sections(
+            "tab-numericas",
+            {name: partial(_numeric_image_task, name, segments["filters"],
+                           None if processes else df)
+             for name, _, _, _ in _NUMERIC_CHARTS},
+            processes=processes,
+        )
+        blocks = [
+            _img_block(res[name][0], alt_txt, res[name][1])
+            for name, _, _, alt_txt in _NUMERIC_CHARTS
+        ]
 
-    def img_block(img_b64, alt_txt, insight):
-        if img_b64 is None:
-            return html.Div(insight, className="graph-insight")
-        return html.Div(
-            className="img-card",
+    return [
+        html.Section(
+            className="section",
             children=[
-                html.Img(
-                    src=f"data:image/png;base64,{img_b64}",
-                    alt=alt_txt,
-                    className="img-plot",
+                html.H2(
+                    "Análisis descriptivo de variables numéricas clave",
+                    className="section-title",
                 ),
-                html.P(insight, className="graph-insight"),
+                html.Div(className="grid-2", children=blocks[:2]),
+                html.Div(className="grid-2", children=blocks[2:]),
             ],
-        )
+        ),
+    ]
+
+
+def _tab_categoricas(df, segments):
+    # Categóricas (Plotly), contadas con los bitmaps del índice de segmentos
+    res = run_sections("tab-categoricas", {
+        name: partial(func, df, segments=segments)
+        for name, func in [
+            ("marital", ec.get_marital_distribution_figure),
+            ("job", ec.get_job_distribution_figure),
+            ("education", ec.get_education_distribution_figure),
+            ("target", ec.get_target_distribution_figure),
+            ("target_donut", ec.get_target_donut_figure),
+            ("marital_donut", ec.get_marital_donut_figure),
+        ]
+    })
+    fig_marital, marital_txt = res["marital"]
+    fig_job, job_txt = res["job"]
+    fig_education, edu_txt = res["education"]
+    fig_y, y_txt = res["target"]
 
-    def graph_block(fig, insight):
-        return html.Div(
-            className="graph-with-text",
+    fig_target_donut = res["target_donut"]
+    fig_marital_donut = res["marital_donut"]
+
+    return [
+        html.Section(
+            className="section",
             children=[
-                dcc.Graph(
-                    figure=fig,
-                    className="graph-card",
-                    style=graph_style,
-                    config=graph_config,
+                html.H2("Visión global de contratación", className="section-title"),
+                html.P(
+                    "Estas dos gráficas de tipo donut muestran, por un lado, la proporción de "
+                    "clientes que contratan el depósito y, por otro, cómo se distribuyen por estado civil.",
+                    className="subtitle",
+                ),
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        html.Div(
+                            className="graph-with-text",
+                            children=[
+                                dcc.Graph(
+                                    figure=fig_target_donut,
+                                    className="graph-card",
+                                    style={"height": "360px", "width": "100%"},
+                                    config={"responsive": True, "displayModeBar": False},
+                                ),
+                                html.P(
+                                    "El donut de la izquierda muestra el porcentaje de clientes que "
+                                    "han contratado el depósito frente a los que no. Permite ver de "
+                                    "un vistazo el desbalance de la variable objetivo.",
+                                    className="graph-insight",
+                                ),
+                            ],
+                        ),
+                        html.Div(
+                            className="graph-with-text",
+                            children=[
+                                dcc.Graph(
+                                    figure=fig_marital_donut,
+                                    className="graph-card",
+                                    style={"height": "360px", "width": "100%"},
+                                    config={"responsive": True, "displayModeBar": False},
+                                ),
+                                html.P(
+                                    "El donut de la derecha muestra la distribución de la cartera "
+                                    "de clientes por estado civil. Los segmentos más grandes representan "
+                                    "los grupos con mayor peso en la base de datos.",
+                                    className="graph-insight",
+                                ),
+                            ],
+                        ),
+                    ],
                 ),
-                html.P(insight, className="graph-insight"),
             ],
-        )
+        ),
+        html.Section(
+            className="section",
+            children=[
+                html.H2(
+                    "Análisis descriptivo de variables categóricas",
+                    className="section-title",
+                ),
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        _graph_block(fig_marital, marital_txt),
+                        _graph_block(fig_job, job_txt),
+                    ],
+                ),
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        _graph_block(fig_education, edu_txt),
+                        _graph_block(fig_y, y_txt),
+                    ],
+                ),
+            ],
+        ),
+    ]
 
-    return html.Div(
-        className="page-container",
-        children=[
-            html.Header(
-                className="header",
-                children=[
-                    html.H1("EDA – Campaña de Depósitos a Plazo", className="title"),
-                    html.P(
-                        "Dashboard descriptivo profesional del dataset fusionado de clientes y campaña.",
-                        className="subtitle",
-                    ),
-                ],
-            ),
-            dcc.Tabs(
-                value="tab-resumen",
-                children=[
-                    dcc.Tab(
-                        label="1. Resumen e información general",
-                        value="tab-resumen",
-                        children=[
-                            html.Section(
-                                className="section metrics-section",
-                                children=[
-                                    html.H2(
-                                        "Información general del dataset",
-                                        className="section-title",
-                                    ),
-                                    html.Div(
-                                        className="metrics-grid",
-                                        children=[
-                                            _metric_card(
-                                                "Total registros",
-                                                f"{metrics['total_registros']:,}",
-                                            ),
-                                            _metric_card(
-                                                "Total variables",
-                                                f"{metrics['total_variables']}",
-                                            ),
-                                            _metric_card(
-                                                "Tasa de conversión (y = yes)",
-                                                f"{metrics['tasa_conversion']:.2f} %"
-                                                if metrics["tasa_conversion"] is not None
-                                                else "N/D",
-                                            ),
-                                            _metric_card(
-                                                "Edad media",
-                                                f"{metrics['edad_media']:.1f} años"
-                                                if metrics["edad_media"] is not None
-                                                else "N/D",
-                                            ),
-                                            _metric_card(
-                                                "Ingreso medio",
-                                                f"{metrics['ingreso_medio']:,.0f}"
-                                                if metrics["ingreso_medio"] is not None
-                                                else "N/D",
-                                            ),
-                                            _metric_card(
-                                                "% con hipoteca",
-                                                f"{metrics['porc_housing_yes']:.1f} %"
-                                                if metrics["porc_housing_yes"] is not None
-                                                else "N/D",
-                                            ),
-                                            _metric_card(
-                                                "% con préstamo personal",
-                                                f"{metrics['porc_loan_yes']:.1f} %"
-                                                if metrics["porc_loan_yes"] is not None
-                                                else "N/D",
-                                            ),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Estadísticos descriptivos globales",
-                                        className="section-title",
-                                    ),
-                                    html.P(
-                                        "Tabla de media, desviación estándar, mínimos, máximos y percentiles "
-                                        "para las principales variables numéricas.",
-                                        className="subtitle",
-                                    ),
-                                    desc_table,
-                                ],
-                            ),
-                        ],
-                    ),
-                    dcc.Tab(
-                        label="2. Variables numéricas (Niños/Adolescentes)",
-                        value="tab-numericas",
-                        children=[
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Análisis descriptivo de variables numéricas clave",
-                                        className="section-title",
-                                    ),
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            img_block(
-                                                age_img,
-                                                "Distribución de la edad",
-                                                age_txt,
-                                            ),
-                                            img_block(
-                                                income_img,
-                                                "Distribución del ingreso",
-                                                income_txt,
-                                            ),
-                                        ],
-                                    ),
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            img_block(
-                                                numweb_img,
-                                                "Visitas web mensuales",
-                                                numweb_txt,
-                                            ),
-                                            img_block(
-                                                kidteen_img,
-                                                "Menores en el hogar",
-                                                kidteen_txt,
-                                            ),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                        ],
-                    ),
-                    dcc.Tab(
-                        label="3. Variables categóricas",
-                        value="tab-categoricas",
-                        children=[
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2("Visión global de contratación", className="section-title"),
-                                    html.P(
-                                        "Estas dos gráficas de tipo donut muestran, por un lado, la proporción de "
-                                        "clientes que contratan el depósito y, por otro, cómo se distribuyen por estado civil.",
-                                        className="subtitle",
-                                    ),
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_target_donut,
-                                                        className="graph-card",
-                                                        style={"height": "360px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    ),
-                                                    html.P(
-                                                        "El donut de la izquierda muestra el porcentaje de clientes que "
-                                                        "han contratado el depósito frente a los que no. Permite ver de "
-                                                        "un vistazo el desbalance de la variable objetivo.",
-                                                        className="graph-insight",
-                                                    ),
-                                                ],
-                                            ),
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_marital_donut,
-                                                        className="graph-card",
-                                                        style={"height": "360px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    ),
-                                                    html.P(
-                                                        "El donut de la derecha muestra la distribución de la cartera "
-                                                        "de clientes por estado civil. Los segmentos más grandes representan "
-                                                        "los grupos con mayor peso en la base de datos.",
-                                                        className="graph-insight",
-                                                    ),
-                                                ],
-                                            ),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Análisis descriptivo de variables categóricas",
-                                        className="section-title",
-                                    ),
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            graph_block(fig_marital, marital_txt),
-                                            graph_block(fig_job, job_txt),
-                                        ],
-                                    ),
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            graph_block(fig_education, edu_txt),
-                                            graph_block(fig_y, y_txt),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                        ],
-                    ),
-                    dcc.Tab(
-                        label="4. Variables financieras y objetivo",
-                        value="tab-financieras",
-                        children=[
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Variables financieras (hipoteca, préstamo, impago)",
-                                        className="section-title",
-                                    ),
-                                    html.Div(
-                                        className="grid-3",
-                                        children=[
-                                            graph_block(fig_housing, housing_txt),
-                                            graph_block(fig_loan, loan_txt),
-                                            graph_block(fig_default, default_txt),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                        ],
-                    ),
-                    dcc.Tab(
-                        label="5. Coordenadas geográficas",
-                        value="tab-geo",
-                        children=[
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Dispersión de coordenadas de los clientes",
-                                        className="section-title",
-                                    ),
-                                    html.P(
-                                        "Diagrama de dispersión de las coordenadas (longitud, latitud). "
-                                        "Cada punto corresponde a un cliente.",
-                                        className="subtitle",
-                                    ),
-                                    html.Div(
-                                        className="graph-with-text",
-                                        children=[
-                                            dcc.Graph(
-                                                figure=fig_geo,
-                                                className="graph-card",
-                                                style={"height": "520px", "width": "100%"},
-                                                config={"responsive": True, "displayModeBar": False},
-                                            )
-                                            if fig_geo is not None
-                                            else html.Div(
-                                                "No se ha podido generar el gráfico de dispersión de coordenadas.",
-                                                className="graph-insight",
-                                            ),
-                                            html.P(geo_txt, className="graph-insight"),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                        ],
-                    ),
-                    dcc.Tab(
-                        label="6. Conversión y correlaciones",
-                        value="tab-conversion",
-                        children=[
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.H2(
-                                        "Tasas de conversión por variables clave",
-                                        className="section-title",
-                                    ),
-                                    html.P(
-                                        "Análisis de la probabilidad de contratación del depósito "
-                                        "en función de edad, ingresos, actividad web e historial de contactos.",
-                                        className="subtitle",
-                                    ),
-
-                                    # 🔹 Filtro de EDAD para esta pestaña
-                                    html.Label("Rango de edad", className="filter-label"),
-                                    dcc.RangeSlider(
-                                        id="filtro-edad-conv",
-                                        min=18,
-                                        max=90,
-                                        step=1,
-                                        value=[25, 60],
-                                        marks={20: "20", 30: "30", 40: "40", 50: "50", 60: "60", 70: "70"},
-                                        tooltip={"placement": "bottom", "always_visible": False},
-                                    ),
-
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        id="graph-conv-age",   # ⬅ ID nuevo
-                                                        figure=fig_conv_age,
-                                                        className="graph-card",
-                                                        style={"height": "320px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    ),
-                                                    html.P(
-                                                        id="text-conv-age",    # ⬅ ID nuevo
-                                                        children=txt_conv_age,
-                                                        className="graph-insight",
-                                                    ),
-                                                ],
-                                            ),
-                                            # ... aquí tu otro gráfico de la grid-2
-                                        ],
-                                    ),
-                                ],
-                            ),
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_conv_web,
-                                                        className="graph-card",
-                                                        style={"height": "320px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    )
-                                                    if fig_conv_web is not None
-                                                    else html.Div(
-                                                        txt_conv_web, className="graph-insight"
-                                                    ),
-                                                    html.P(txt_conv_web, className="graph-insight")
-                                                    if fig_conv_web is not None
-                                                    else None,
-                                                ],
-                                            ),
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_conv_prev,
-                                                        className="graph-card",
-                                                        style={"height": "320px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    )
-                                                    if fig_conv_prev is not None
-                                                    else html.Div(
-                                                        txt_conv_prev, className="graph-insight"
-                                                    ),
-                                                    html.P(txt_conv_prev, className="graph-insight")
-                                                    if fig_conv_prev is not None
-                                                    else None,
-                                                ],
-                                            ),
-                                        ],
-                                    ),
-                                ],
-                            ),
-                            html.Section(
-                                className="section",
-                                children=[
-                                    html.Div(
-                                        className="grid-2",
-                                        children=[
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_log_age,
-                                                        className="graph-card",
-                                                        style={"height": "320px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    )
-                                                    if fig_log_age is not None
-                                                    else html.Div(
-                                                        txt_log_age, className="graph-insight"
-                                                    ),
-                                                    html.P(txt_log_age, className="graph-insight")
-                                                    if fig_log_age is not None
-                                                    else None,
-                                                ],
-                                            ),
-                                            html.Div(
-                                                className="graph-with-text",
-                                                children=[
-                                                    dcc.Graph(
-                                                        figure=fig_corr,
-                                                        className="graph-card",
-                                                        style={"height": "520px", "width": "100%"},
-                                                        config={"responsive": True, "displayModeBar": False},
-                                                    )
-                                                    if fig_corr is not None
-                                                    else html.Div(
-                                                        txt_corr, className="graph-insight"
-                                                    ),
-                                                    html.P(txt_corr, className="graph-insight")
-                                                    if fig_corr is not None
-                                                    else None,
-                                                ],
-                                            ),
-                                        ],
-                                    ),
-                                ],
-                            ),
+
+def _tab_financieras(df, segments):
+    res = run_sections("tab-financieras", {
+        col: partial(ec.get_binary_financial_figure, df, col, titulo, segments=segments)
+        for col, titulo in [
+            ("housing", "Situación hipotecaria de los clientes"),
+            ("loan", "Clientes con préstamo personal"),
+            ("default", "Historial de impago (default)"),
+        ]
+    })
+    fig_housing, housing_txt = res["housing"]
+    fig_loan, loan_txt = res["loan"]
+    fig_default, default_txt = res["default"]
+
+    return [
+        html.Section(
+            className="section",
+            children=[
+                html.H2(
+                    "Variables financieras (hipoteca, préstamo, impago)",
+                    className="section-title",
+                ),
+                html.Div(
+                    className="grid-3",
+                    children=[
+                        _graph_block(fig_housing, housing_txt),
+                        _graph_block(fig_loan, loan_txt),
+                        _graph_block(fig_default, default_txt),
                     ],
                 ),
+            ],
+        ),
+    ]
 
-                ],
-            ),
-        ],
+
+def _tab_geo(df, segments):
+    # Mapa geográfico (en modo densidad se re-agrega al hacer zoom, ver app.py)
+    density = ec.GEO_MODE != "scatter"
+    geo_coords = get_derived("geo_coords", build_geo_coords, df) if density else None
+    fig_geo, geo_txt = ec.get_geo_density_figure(df, geo_coords)
+
+    return [
+        html.Section(
+            className="section",
+            children=[
+                html.H2(
+                    "Densidad de clientes por coordenadas"
+                    if density
+                    else "Dispersión de coordenadas de los clientes",
+                    className="section-title",
+                ),
+                html.P(
+                    "Rejilla de densidad de las coordenadas (longitud, latitud). "
+                    "Cada celda agrupa a los clientes de esa zona."
+                    if density
+                    else "Diagrama de dispersión de las coordenadas (longitud, latitud). "
+                    "Cada punto corresponde a un cliente.",
+                    className="subtitle",
+                ),
+                html.Div(
+                    className="graph-with-text",
+                    children=[
+                        dcc.Graph(
+                            id="graph-geo",
+                            figure=fig_geo,
+                            className="graph-card",
+                            style={"height": "520px", "width": "100%"},
+                            config={"responsive": True, "displayModeBar": False},
+                        )
+                        if fig_geo is not None
+                        else html.Div(
+                            "No se ha podido generar el gráfico de dispersión de coordenadas.",
+                            className="graph-insight",
+                        ),
+                        html.P(geo_txt, className="graph-insight"),
+                    ],
+                ),
+            ],
+        ),
+    ]
+
+
+def _tab_conversion(df, segments):
+    # Conversión y correlaciones. Con filtros no se construye otro cubo: se
+    # parte del cubo del dataset completo y se calculan solo estos marginales
+    cube = cube_for_filters(
+        get_derived("cube", build_aggregate_cube, None if segments["filters"] else df),
+        df, segments["filters"], numeric=["age", "NumWebVisitsMonth", "previous"],
     )
+    res = run_sections("tab-conversion", {
+        "conv_age": partial(ec.get_conversion_by_age_figure, df, cube=cube),
+        "conv_web": partial(ec.get_conversion_by_webvisits_figure, df, cube=cube),
+        "conv_prev": partial(ec.get_conversion_by_previous_figure, df, cube=cube),
+        "logistic_age": lambda: ec.get_logistic_age_curve_figure(
+            df, model=get_derived("logistic_age", build_logistic_age_model, df)
+        ),
+        "correlation": partial(ec.get_target_correlation_heatmap, df),
+    })
+    fig_conv_age, txt_conv_age = res["conv_age"]
+    fig_conv_web, txt_conv_web = res["conv_web"]
+    fig_conv_prev, txt_conv_prev = res["conv_prev"]
+    fig_log_age, txt_log_age = res["logistic_age"]
+    fig_corr, txt_corr = res["correlation"]
+
+    return [
+        html.Section(
+            className="section",
+            children=[
+                html.H2(
+                    "Tasas de conversión por variables clave",
+                    className="section-title",
+                ),
+                html.P(
+                    "Análisis de la probabilidad de contratación del depósito "
+                    "en función de edad, ingresos, actividad web e historial de contactos.",
+                    className="subtitle",
+                ),
+
+                # 🔹 Filtro de EDAD para esta pestaña
+                html.Label("Rango de edad", className="filter-label"),
+                dcc.RangeSlider(
+                    id="filtro-edad-conv",
+                    min=18,
+                    max=90,
+                    step=1,
+                    value=[25, 60],
+                    marks={20: "20", 30: "30", 40: "40", 50: "50", 60: "60", 70: "70"},
+                    tooltip={"placement": "bottom", "always_visible": False},
+                ),
+
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        html.Div(
+                            className="graph-with-text",
+                            children=[
+                                dcc.Graph(
+                                    id="graph-conv-age",   # ⬅ ID nuevo
+                                    figure=fig_conv_age,
+                                    className="graph-card",
+                                    style={"height": "320px", "width": "100%"},
+                                    config={"responsive": True, "displayModeBar": False},
+                                ),
+                                html.P(
+                                    id="text-conv-age",    # ⬅ ID nuevo
+                                    children=txt_conv_age,
+                                    className="graph-insight",
+                                ),
+                            ],
+                        ),
+                        # ... aquí tu otro gráfico de la grid-2
+                    ],
+                ),
+            ],
+        ),
+        html.Section(
+            className="section",
+            children=[
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        _optional_graph_block(fig_conv_web, txt_conv_web),
+                        _optional_graph_block(fig_conv_prev, txt_conv_prev),
+                    ],
+                ),
+            ],
+        ),
+        html.Section(
+            className="section",
+            children=[
+                html.Div(
+                    className="grid-2",
+                    children=[
+                        _optional_graph_block(fig_log_age, txt_log_age),
+                        _optional_graph_block(fig_corr, txt_corr, height="520px"),
+                    ],
+                ),
+            ],
+        ),
+    ]
+
+
+_TAB_BUILDERS = {
+    "tab-resumen": _tab_resumen,
+    "tab-numericas": _tab_numericas,
+    "tab-categoricas": _tab_categoricas,
+    "tab-financieras": _tab_financieras,
+    "tab-geo": _tab_geo,
+    "tab-conversion": _tab_conversion,
+}
+TAB_NAMES = list(_TAB_BUILDERS)